@@ -1,5 +1,7 @@
+import asyncio
+import re
 import anthropic
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator
 
 
 class AIGenerator:
@@ -18,6 +20,7 @@ Tool Usage Guidelines:
 - **Multi-round tool usage**: You can use tools up to 2 times in separate rounds for complex queries
 - **Sequential reasoning**: Use initial tool results to inform follow-up tool calls when needed
 - **Progressive information gathering**: Start broad, then narrow focus based on results
+- **Parallel tool calls**: For independent subqueries, emit tool calls in parallel within the same round
 - Synthesize tool results into accurate, fact-based responses
 - If tools yield no results, state this clearly without offering alternatives
 
@@ -45,8 +48,51 @@ All responses must be:
 Provide only the direct answer to what was asked.
 """
 
+    # System prompt block built once for all instances and passed to the SDK
+    # as-is; it carries the cache breakpoint so Anthropic can serve it from
+    # the prompt cache. Shared across requests, so never mutated.
+    SYSTEM_PROMPT_BLOCKS = [
+        {
+            "type": "text",
+            "text": SYSTEM_PROMPT,
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+
+    # Answer used when Claude's tool calls produced nothing and it wrote no text
+    TOOL_FAILURE_MESSAGE = (
+        "I apologize, but I encountered an error while processing your request."
+    )
+
+    # Phrasings that unambiguously need one tool; forcing it on the first round
+    # skips Claude's decide-then-call preamble. Anything else stays on "auto".
+    # Outline phrasings must ask about a course's structure, so "outline the
+    # steps to..." or "what lessons does it teach about..." stay on "auto".
+    FORCED_TOOL_PATTERNS = (
+        (
+            "get_course_outline",
+            re.compile(
+                r"\b(?:course outline"
+                r"|outline (?:of|for) (?:the |this )?(?:[\w:-]+ ){0,4}course"
+                r"|syllabus|table of contents|lesson list"
+                r"|list (?:of |all )?(?:the )?lessons|how many lessons"
+                r"|what lessons are (?:in|there)|lessons (?:in|of) (?:the )?course)\b",
+                re.IGNORECASE,
+            ),
+        ),
+        (
+            "search_course_content",
+            re.compile(
+                r"\b(?:covered|taught|explained|discussed|mentioned)"
+                r" in (?:lesson \d+|the course)\b"
+                r"|\blesson \d+ (?:cover|teach|explain|discuss)",
+                re.IGNORECASE,
+            ),
+        ),
+    )
+
     def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+        self.client = anthropic.AsyncAnthropic(api_key=api_key)
         self.model = model
 
         # Pre-build base API parameters
@@ -55,10 +101,14 @@ Provide only the direct answer to what was asked.
         # Configuration for sequential tool calling
         self.MAX_TOOL_ROUNDS = 2
 
-    def generate_response(
+        # Cache-tagged copy of the last tool list seen, see _with_cache_breakpoint
+        self._tagged_tools_source: Optional[List] = None
+        self._tagged_tools: List = []
+
+    async def generate_response(
         self,
         query: str,
-        conversation_history: Optional[str] = None,
+        conversation_history: Optional[List[Dict]] = None,
         tools: Optional[List] = None,
         tool_manager=None,
     ) -> str:
@@ -68,68 +118,228 @@ Provide only the direct answer to what was asked.
 
         Args:
             query: The user's question or request
-            conversation_history: Previous messages for context
+            conversation_history: Previous user/assistant messages for context
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
 
         Returns:
             Generated response as string
         """
-
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history
-            else self.SYSTEM_PROMPT
-        )
+        # History rides in the messages so the system prompt and tools stay an
+        # unchanged prefix that Anthropic can serve from the prompt cache
+        messages = [*(conversation_history or ()), {"role": "user", "content": query}]
 
         # Use sequential tool calling if tools are available
         if tools and tool_manager:
-            return self._sequential_tool_calling(
-                query, system_content, tools, tool_manager
+            return await self._sequential_tool_calling(
+                query, messages, self._with_cache_breakpoint(tools), tool_manager
             )
 
         # Fall back to single API call without tools
         api_params = {
             **self.base_params,
-            "messages": [{"role": "user", "content": query}],
-            "system": system_content,
+            "messages": messages,
+            "system": self.SYSTEM_PROMPT_BLOCKS,
         }
 
-        response = self.client.messages.create(**api_params)
+        response = await self.client.messages.create(**api_params)
         return response.content[0].text
 
-    def _sequential_tool_calling(
-        self, query: str, system_content: str, tools: List, tool_manager
+    async def generate_response_stream(
+        self,
+        query: str,
+        conversation_history: Optional[List[Dict]] = None,
+        tools: Optional[List] = None,
+        tool_manager=None,
+    ) -> AsyncIterator[Dict]:
+        """
+        Stream an AI response as text deltas while Claude generates it.
+        Follows the same tool rounds as generate_response; text from every
+        round is yielded as soon as it arrives.
+
+        Whether a round ends in tool calls is only known once it finishes, so
+        text Claude wrote ahead of its tool calls is retracted with a discard
+        event; the answer is the text streamed since the last discard, which
+        matches what generate_response returns.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous user/assistant messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+
+        Yields:
+            {"type": "delta", "text": ...} events for chunks of response text
+            and {"type": "discard"} events for text that is not in the answer
+        """
+        messages = [*(conversation_history or ()), {"role": "user", "content": query}]
+        api_params = {**self.base_params, "system": self.SYSTEM_PROMPT_BLOCKS}
+
+        use_tools = bool(tools and tool_manager)
+        if use_tools:
+            api_params["tools"] = self._with_cache_breakpoint(tools)
+            api_params["tool_choice"] = self._first_round_tool_choice(query, tools)
+
+        round_count = 0
+        while True:
+            streamed = False
+            # Each round gets its own copy of the conversation so far
+            async with self.client.messages.stream(
+                **api_params, messages=[*messages]
+            ) as stream:
+                async for text in stream.text_stream:
+                    streamed = True
+                    yield {"type": "delta", "text": text}
+                response = await stream.get_final_message()
+
+            if not use_tools or response.stop_reason != "tool_use":
+                return
+
+            # Claude used tools - execute them and continue the conversation
+            messages.append({"role": "assistant", "content": response.content})
+            tool_results = await self._execute_tools(response, tool_manager)
+            if not tool_results:
+                # Text already streamed stands as the answer, as in generate_response
+                if not streamed:
+                    yield {"type": "delta", "text": self.TOOL_FAILURE_MESSAGE}
+                return
+            messages.append({"role": "user", "content": tool_results})
+
+            round_count += 1
+            if round_count >= self.MAX_TOOL_ROUNDS and self._text_if_all_tools_failed(
+                response, tool_results
+            ):
+                # Text already streamed stands as the answer if every tool failed
+                return
+
+            # Anything written before the tool calls was not the answer
+            if streamed:
+                yield {"type": "discard"}
+
+            if round_count >= self.MAX_TOOL_ROUNDS:
+                # Max rounds reached - final synthesis round; tools stay attached
+                # to keep the cached prefix but can no longer be called
+                use_tools = False
+                api_params["tool_choice"] = {"type": "none"}
+            else:
+                api_params["tool_choice"] = {"type": "auto"}
+
+    async def generate_batch(
+        self, queries: List[str], poll_interval: float = 20
+    ) -> List[Optional[str]]:
+        """
+        Generate responses for independent queries via the Message Batches API.
+        Batches cost half as much as interactive calls but can take minutes to
+        complete, so this is meant for offline work such as evaluation runs.
+        Tools are not offered since a batch request cannot run the tool loop.
+
+        Args:
+            queries: User prompts, each answered on its own
+            poll_interval: Seconds to wait between batch status checks
+
+        Returns:
+            Responses in query order, None for requests that did not succeed
+        """
+        if not queries:
+            return []
+
+        requests = [
+            {
+                "custom_id": f"query-{index}",
+                "params": {
+                    **self.base_params,
+                    "messages": [{"role": "user", "content": query}],
+                    "system": self.SYSTEM_PROMPT_BLOCKS,
+                },
+            }
+            for index, query in enumerate(queries)
+        ]
+
+        batch = await self.client.messages.batches.create(requests=requests)
+        while batch.processing_status != "ended":
+            await asyncio.sleep(poll_interval)
+            batch = await self.client.messages.batches.retrieve(batch.id)
+
+        # Results arrive in arbitrary order - match them back by custom_id
+        responses: List[Optional[str]] = [None] * len(queries)
+        async for entry in await self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                index = int(entry.custom_id.removeprefix("query-"))
+                responses[index] = entry.result.message.content[0].text
+
+        return responses
+
+    def _with_cache_breakpoint(self, tools: List) -> List:
+        """
+        Mark the last tool definition as a prompt cache breakpoint.
+
+        ToolManager hands out the same list until a tool is registered, so the
+        tagged copy is only rebuilt when a different list object comes in.
+
+        Args:
+            tools: Tool definitions, left unmodified
+
+        Returns:
+            Copy of the tool list whose last entry carries cache_control
+        """
+        if tools is not self._tagged_tools_source:
+            self._tagged_tools = [
+                *tools[:-1],
+                {**tools[-1], "cache_control": {"type": "ephemeral"}},
+            ]
+            self._tagged_tools_source = tools
+        return self._tagged_tools
+
+    def _first_round_tool_choice(self, query: str, tools: List) -> Dict:
+        """
+        Pick the tool_choice for the first round from the query's phrasing.
+
+        Args:
+            query: The user's question
+            tools: Tool definitions offered to Claude
+
+        Returns:
+            A forced tool choice when the query clearly needs an offered tool,
+            otherwise auto
+        """
+        offered = {tool["name"] for tool in tools}
+        for tool_name, pattern in self.FORCED_TOOL_PATTERNS:
+            if tool_name in offered and pattern.search(query):
+                return {"type": "tool", "name": tool_name}
+        return {"type": "auto"}
+
+    async def _sequential_tool_calling(
+        self, query: str, messages: List[Dict], tools: List, tool_manager
     ) -> str:
         """
         Handle sequential tool calling with up to MAX_TOOL_ROUNDS rounds.
 
         Args:
             query: The user's question
-            system_content: System prompt with conversation history
+            messages: Conversation history followed by the user query; extended
+                in place with each tool round
             tools: Available tools for Claude to use
             tool_manager: Manager to execute tools
 
         Returns:
             Final response after all tool rounds
         """
-        # Initialize conversation with user query
-        messages = [{"role": "user", "content": query}]
         round_count = 0
 
-        while round_count < self.MAX_TOOL_ROUNDS:
-            # Prepare API call with tools available
-            api_params = {
-                **self.base_params,
-                "messages": messages,
-                "system": system_content,
-                "tools": tools,
-                "tool_choice": {"type": "auto"},
-            }
+        # Prepare API call with tools available once - only the messages
+        # grow between rounds, and each call is sent its own copy of them
+        api_params = {
+            **self.base_params,
+            "system": self.SYSTEM_PROMPT_BLOCKS,
+            "tools": tools,
+            "tool_choice": self._first_round_tool_choice(query, tools),
+        }
 
+        while round_count < self.MAX_TOOL_ROUNDS:
             # Get response from Claude
-            response = self.client.messages.create(**api_params)
+            response = await self.client.messages.create(
+                **api_params, messages=[*messages]
+            )
 
             # Check if Claude decided to use tools
             if response.stop_reason != "tool_use":
@@ -140,35 +350,66 @@ Provide only the direct answer to what was asked.
             messages.append({"role": "assistant", "content": response.content})
 
             # Execute all tool calls and collect results
-            tool_results = self._execute_tools(response, tool_manager)
+            tool_results = await self._execute_tools(response, tool_manager)
 
             # If no tool results (all tools failed), terminate early
             if not tool_results:
-                # Return Claude's original response since tools failed
-                return (
-                    response.content[0].text
-                    if response.content
-                    else "I apologize, but I encountered an error while processing your request."
-                )
+                # Return the text Claude wrote alongside the calls; a forced
+                # first round has none, only the tool_use block
+                return self._response_text(response) or self.TOOL_FAILURE_MESSAGE
 
             # Add tool results to conversation
             messages.append({"role": "user", "content": tool_results})
 
-            round_count += 1
+            # Only the first round is ever forced; follow-ups are Claude's call
+            api_params["tool_choice"] = {"type": "auto"}
 
-        # Max rounds reached - make final synthesis call without tools
-        final_params = {
-            **self.base_params,
-            "messages": messages,
-            "system": system_content,
-        }
+            round_count += 1
 
-        final_response = self.client.messages.create(**final_params)
+        # Max rounds reached - only here does the last response still end in
+        # tool_use with unanswered tool results, so a final synthesis call that
+        # cannot use tools is needed; any earlier end_turn has already returned.
+        # If every tool in that round failed, a synthesis call has nothing new
+        # to work with, so any text Claude wrote alongside the calls is used
+        fallback_text = self._text_if_all_tools_failed(response, tool_results)
+        if fallback_text:
+            return fallback_text
+
+        # Tools stay attached so the request keeps the cached tools/system
+        # prefix, but tool_choice "none" makes Claude answer with what it has
+        api_params["tool_choice"] = {"type": "none"}
+
+        final_response = await self.client.messages.create(
+            **api_params, messages=[*messages]
+        )
         return final_response.content[0].text
 
-    def _execute_tools(self, response, tool_manager) -> List[Dict]:
+    @staticmethod
+    def _text_if_all_tools_failed(response, tool_results: List[Dict]) -> Optional[str]:
+        """
+        Get the text Claude wrote alongside tool calls that all failed.
+
+        Args:
+            response: Claude response containing tool use blocks
+            tool_results: Results of executing that response's tool calls
+
+        Returns:
+            Joined text blocks, or None if any tool succeeded or there is no text
+        """
+        if not all(result.get("is_error") for result in tool_results):
+            return None
+        return AIGenerator._response_text(response) or None
+
+    @staticmethod
+    def _response_text(response) -> str:
+        """Join the text blocks of a response, skipping tool use blocks"""
+        return "\n".join(
+            block.text for block in response.content if block.type == "text"
+        )
+
+    async def _execute_tools(self, response, tool_manager) -> List[Dict]:
         """
-        Execute all tool calls in a response and return formatted results.
+        Execute all tool calls in a response concurrently and return formatted results.
 
         Args:
             response: Claude response containing tool use blocks
@@ -177,26 +418,40 @@ Provide only the direct answer to what was asked.
         Returns:
             List of tool results formatted for conversation, empty list if all tools fail
         """
-        tool_results = []
-        for content_block in response.content:
-            if content_block.type == "tool_use":
-                tool_result = tool_manager.execute_tool(
-                    content_block.name, **content_block.input
-                )
-
-                # Only add results if tool execution succeeded
-                if tool_result is not None:
-                    tool_results.append(
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": tool_result,
-                        }
-                    )
-
-        return tool_results
-
-    def _handle_tool_execution(
+        tool_blocks = [block for block in response.content if block.type == "tool_use"]
+
+        # Tools do blocking vector store I/O, so run them on the default thread
+        # pool; gather keeps results in the same order as the tool_use blocks
+        outcomes = await asyncio.gather(
+            *(
+                asyncio.to_thread(tool_manager.execute_tool, block.name, **block.input)
+                for block in tool_blocks
+            ),
+            return_exceptions=True,
+        )
+
+        # Failures are reported to Claude rather than aborting the other tools;
+        # tools that returned None are left out
+        return [
+            (
+                {
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": f"Tool execution failed: {outcome}",
+                    "is_error": True,
+                }
+                if isinstance(outcome, Exception)
+                else {
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": outcome,
+                }
+            )
+            for block, outcome in zip(tool_blocks, outcomes, strict=True)
+            if outcome is not None
+        ]
+
+    async def _handle_tool_execution(
         self, initial_response, base_params: Dict[str, Any], tool_manager
     ):
         """
@@ -210,14 +465,15 @@ Provide only the direct answer to what was asked.
         Returns:
             Final response text after tool execution
         """
-        # Start with existing messages
-        messages = base_params["messages"].copy()
-
-        # Add AI's tool use response
-        messages.append({"role": "assistant", "content": initial_response.content})
+        # Start with existing messages plus AI's tool use response; building a
+        # new list leaves the caller's base_params["messages"] untouched
+        messages = [
+            *base_params["messages"],
+            {"role": "assistant", "content": initial_response.content},
+        ]
 
         # Execute tools using new method
-        tool_results = self._execute_tools(initial_response, tool_manager)
+        tool_results = await self._execute_tools(initial_response, tool_manager)
 
         # Add tool results as single message
         if tool_results:
@@ -231,5 +487,5 @@ Provide only the direct answer to what was asked.
         }
 
         # Get final response
-        final_response = self.client.messages.create(**final_params)
+        final_response = await self.client.messages.create(**final_params)
         return final_response.content[0].text
@@ -6,8 +6,10 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import json
 import os
 
 from config import config
@@ -76,6 +78,20 @@ class ClearSessionResponse(BaseModel):
     message: str
 
 
+def to_source_items(sources: list) -> List[SourceItem]:
+    """Convert sources to SourceItem format"""
+    source_items = []
+    for source in sources:
+        if isinstance(source, dict):
+            source_items.append(
+                SourceItem(text=source.get("text", ""), link=source.get("link"))
+            )
+        else:
+            # Handle legacy string format
+            source_items.append(SourceItem(text=str(source), link=None))
+    return source_items
+
+
 # API Endpoints
 
 
@@ -89,24 +105,42 @@ async def query_documents(request: QueryRequest):
             session_id = rag_system.session_manager.create_session()
 
         # Process query using RAG system
-        answer, sources = rag_system.query(request.query, session_id)
-
-        # Convert sources to SourceItem format
-        source_items = []
-        for source in sources:
-            if isinstance(source, dict):
-                source_items.append(
-                    SourceItem(text=source.get("text", ""), link=source.get("link"))
-                )
-            else:
-                # Handle legacy string format
-                source_items.append(SourceItem(text=str(source), link=None))
-
-        return QueryResponse(answer=answer, sources=source_items, session_id=session_id)
+        answer, sources = await rag_system.query(request.query, session_id)
+
+        return QueryResponse(
+            answer=answer, sources=to_source_items(sources), session_id=session_id
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """Process a query and stream the answer as server-sent events"""
+    session_id = request.session_id
+    if not session_id:
+        session_id = rag_system.session_manager.create_session()
+
+    async def event_stream():
+        yield f"data: {json.dumps({'type': 'session', 'session_id': session_id})}\n\n"
+        try:
+            async for event in rag_system.query_stream(request.query, session_id):
+                if event["type"] == "sources":
+                    event = {
+                        "type": "sources",
+                        "sources": [
+                            item.model_dump()
+                            for item in to_source_items(event["sources"])
+                        ],
+                    }
+                yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-stream
+            yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.get("/api/courses", response_model=CourseStats)
 async def get_course_stats():
     """Get course analytics and statistics"""
@@ -23,6 +23,13 @@ class Config:
     MAX_RESULTS: int = 5  # Maximum search results to return
     MAX_HISTORY: int = 2  # Number of conversation messages to remember
 
+    # Response cache settings
+    RESPONSE_CACHE_SIZE: int = 256  # Maximum cached answers (0 disables caching)
+    RESPONSE_CACHE_TTL: int = 300  # Seconds before a cached answer expires
+
+    # Message Batches API settings (offline queries)
+    BATCH_POLL_INTERVAL: int = 20  # Seconds between batch status checks
+
     # Database paths
     CHROMA_PATH: str = "./chroma_db"  # ChromaDB storage location
 
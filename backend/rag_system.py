@@ -1,12 +1,17 @@
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, AsyncIterator
+import asyncio
 import os
 from document_processor import DocumentProcessor
 from vector_store import VectorStore
 from ai_generator import AIGenerator
 from session_manager import SessionManager
-from search_tools import ToolManager, CourseSearchTool, CourseOutlineTool
+from response_cache import ResponseCache
+from search_tools import ToolManager, ToolRun, CourseSearchTool, CourseOutlineTool
 from models import Course, Lesson, CourseChunk
 
+# File types add_course_folder will load as course documents
+COURSE_FILE_EXTENSIONS = frozenset({".pdf", ".docx", ".txt"})
+
 
 class RAGSystem:
     """Main orchestrator for the Retrieval-Augmented Generation system"""
@@ -25,6 +30,11 @@ class RAGSystem:
             config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL
         )
         self.session_manager = SessionManager(config.MAX_HISTORY)
+        self.response_cache = ResponseCache(
+            config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL
+        )
+        self._keyed_tools: Optional[List] = None
+        self._tools_key = ""
 
         # Initialize search tools
         self.tool_manager = ToolManager()
@@ -55,6 +65,9 @@ class RAGSystem:
             # Add course content chunks to vector store
             self.vector_store.add_course_content(course_chunks)
 
+            # Cached answers may be stale now that the knowledge base changed
+            self.response_cache.clear()
+
             return course, len(course_chunks)
         except Exception as e:
             print(f"Error processing course document {file_path}: {e}")
@@ -91,9 +104,8 @@ class RAGSystem:
         # Process each file in the folder
         for file_name in os.listdir(folder_path):
             file_path = os.path.join(folder_path, file_name)
-            if os.path.isfile(file_path) and file_name.lower().endswith(
-                (".pdf", ".docx", ".txt")
-            ):
+            extension = os.path.splitext(file_name)[1].lower()
+            if extension in COURSE_FILE_EXTENSIONS and os.path.isfile(file_path):
                 try:
                     # Check if this course might already exist
                     # We'll process the document to get the course ID, but only add if new
@@ -116,9 +128,13 @@ class RAGSystem:
                 except Exception as e:
                     print(f"Error processing {file_name}: {e}")
 
+        # Cached answers may be stale now that the knowledge base changed
+        if clear_existing or total_courses:
+            self.response_cache.clear()
+
         return total_courses, total_chunks
 
-    def query(
+    async def query(
         self, query: str, session_id: Optional[str] = None
     ) -> Tuple[str, List[str]]:
         """
@@ -139,19 +155,30 @@ class RAGSystem:
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
 
-        # Generate response using AI with tools
-        response = self.ai_generator.generate_response(
-            query=prompt,
-            conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_manager=self.tool_manager,
-        )
+        tools = self.tool_manager.get_tool_definitions()
 
-        # Get sources from the search tool
-        sources = self.tool_manager.get_last_sources()
+        # Answer and sources are cached together so a hit needs no tool calls
+        cache_key = ResponseCache.make_key(
+            prompt, history, self._tools_cache_key(tools)
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            response, sources = cached
+        else:
+            # Tool runs are tracked per request, so overlapping queries never
+            # pick up each other's search results
+            with self.tool_manager.tool_run() as run:
+                # Generate response using AI with tools
+                response = await self.ai_generator.generate_response(
+                    query=prompt,
+                    conversation_history=history,
+                    tools=tools,
+                    tool_manager=self.tool_manager,
+                )
+            sources = run.sources
 
-        # Reset sources after retrieving them
-        self.tool_manager.reset_sources()
+            if self._is_cacheable(response, run):
+                self.response_cache.set(cache_key, (response, sources))
 
         # Update conversation history
         if session_id:
@@ -160,6 +187,111 @@ class RAGSystem:
         # Return response with sources from tool searches
         return response, sources
 
+    async def query_stream(
+        self, query: str, session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Process a user query like query(), streaming the answer as it is generated.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Yields:
+            {"type": "delta", "text": ...} events for the answer text, with
+            {"type": "discard"} events dropping text streamed before a tool
+            call, followed by a single {"type": "sources", "sources": [...]} event
+        """
+        prompt = f"""Answer this question about course materials: {query}"""
+
+        history = None
+        if session_id:
+            history = self.session_manager.get_conversation_history(session_id)
+
+        tools = self.tool_manager.get_tool_definitions()
+
+        # Shares cache entries with query() - a hit is sent as a single delta
+        cache_key = ResponseCache.make_key(
+            prompt, history, self._tools_cache_key(tools)
+        )
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            response, sources = cached
+            yield {"type": "delta", "text": response}
+        else:
+            chunks: List[str] = []
+            with self.tool_manager.tool_run() as run:
+                async for event in self.ai_generator.generate_response_stream(
+                    query=prompt,
+                    conversation_history=history,
+                    tools=tools,
+                    tool_manager=self.tool_manager,
+                ):
+                    # Only text since the last discard is the answer, matching query()
+                    if event["type"] == "discard":
+                        chunks.clear()
+                    else:
+                        chunks.append(event["text"])
+                    yield event
+
+            response = "".join(chunks)
+            sources = run.sources
+
+            if self._is_cacheable(response, run):
+                self.response_cache.set(cache_key, (response, sources))
+
+        # Update conversation history once the full answer is known
+        if session_id:
+            self.session_manager.add_exchange(session_id, query, response)
+
+        yield {"type": "sources", "sources": sources}
+
+    async def query_batch(self, queries: List[str]) -> List[Tuple[Optional[str], List]]:
+        """
+        Answer many queries offline through the discounted Message Batches API.
+
+        Batch requests cannot run the tool loop, so course content is retrieved
+        up front for each query and included in its prompt.
+
+        Args:
+            queries: User questions, answered independently without sessions
+
+        Returns:
+            List of (response or None if that request failed, sources) in query order
+        """
+        prompts = []
+        all_sources = []
+        for query in queries:
+            # Searches do blocking vector store I/O, so keep them off the event loop
+            with self.tool_manager.tool_run() as run:
+                context = await asyncio.to_thread(self.search_tool.execute, query=query)
+            all_sources.append(run.sources)
+
+            prompts.append(
+                f"Answer this question about course materials: {query}\n\n"
+                f"Relevant course content:\n{context}"
+            )
+
+        responses = await self.ai_generator.generate_batch(
+            prompts, poll_interval=self.config.BATCH_POLL_INTERVAL
+        )
+        return list(zip(responses, all_sources, strict=True))
+
+    def _is_cacheable(self, response: str, run: ToolRun) -> bool:
+        """Only cache real answers; a tool failure may be transient"""
+        return (
+            bool(response)
+            and not run.failed
+            and response != self.ai_generator.TOOL_FAILURE_MESSAGE
+        )
+
+    def _tools_cache_key(self, tools: List) -> str:
+        """Hash tool definitions for cache keys, reusing it while the list is unchanged"""
+        if tools is not self._keyed_tools:
+            self._tools_key = ResponseCache.make_key(tools).hex()
+            self._keyed_tools = tools
+        return self._tools_key
+
     def get_course_analytics(self) -> Dict:
         """Get analytics about the course catalog"""
         return {
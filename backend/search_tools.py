@@ -1,8 +1,23 @@
-from typing import Dict, Any, Optional, Protocol
+from typing import Dict, Any, Iterator, List, Optional, Protocol
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from vector_store import VectorStore, SearchResults
 
 
+@dataclass
+class ToolRun:
+    """Outcome of the tool calls made for one request"""
+
+    sources: List[Dict] = field(default_factory=list)  # From every search, in order
+    failed: bool = False  # Whether any tool raised or returned nothing
+
+
+# Tool run for the request being handled, see ToolManager.tool_run
+_current_run: ContextVar[Optional[ToolRun]] = ContextVar("current_run", default=None)
+
+
 class Tool(ABC):
     """Abstract base class for all tools"""
 
@@ -22,7 +37,6 @@ class CourseSearchTool(Tool):
 
     def __init__(self, vector_store: VectorStore):
         self.store = vector_store
-        self.last_sources = []  # Track sources from last search
 
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
@@ -119,8 +133,11 @@ class CourseSearchTool(Tool):
 
             formatted.append(f"{header}\n{doc}")
 
-        # Store sources for retrieval
-        self.last_sources = sources
+        # Record sources for the current request; searches may run in
+        # parallel, so they are added to rather than replaced
+        run = _current_run.get()
+        if run is not None:
+            run.sources.extend(sources)
 
         return "\n\n".join(formatted)
 
@@ -203,6 +220,8 @@ class ToolManager:
 
     def __init__(self):
         self.tools = {}
+        self._definitions = {}  # Tool schemas are static, so build them once
+        self._definition_list = []
 
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
@@ -211,28 +230,48 @@ class ToolManager:
         if not tool_name:
             raise ValueError("Tool must have a 'name' in its definition")
         self.tools[tool_name] = tool
+        self._definitions[tool_name] = tool_def
+        self._definition_list = list(self._definitions.values())
 
     def get_tool_definitions(self) -> list:
-        """Get all tool definitions for Anthropic tool calling"""
-        return [tool.get_tool_definition() for tool in self.tools.values()]
+        """Get all tool definitions for Anthropic tool calling (shared, do not mutate)"""
+        return self._definition_list
 
     def execute_tool(self, tool_name: str, **kwargs) -> str:
         """Execute a tool by name with given parameters"""
         if tool_name not in self.tools:
             return f"Tool '{tool_name}' not found"
 
-        return self.tools[tool_name].execute(**kwargs)
-
-    def get_last_sources(self) -> list:
-        """Get sources from the last search operation"""
-        # Check all tools for last_sources attribute
-        for tool in self.tools.values():
-            if hasattr(tool, "last_sources") and tool.last_sources:
-                return tool.last_sources
-        return []
-
-    def reset_sources(self):
-        """Reset sources from all tools that track sources"""
-        for tool in self.tools.values():
-            if hasattr(tool, "last_sources"):
-                tool.last_sources = []
+        run = _current_run.get()
+        try:
+            result = self.tools[tool_name].execute(**kwargs)
+        except Exception:
+            if run is not None:
+                run.failed = True
+            raise
+
+        if result is None and run is not None:
+            run.failed = True
+        return result
+
+    @contextmanager
+    def tool_run(self) -> Iterator[ToolRun]:
+        """
+        Record the sources and failures of tool calls made inside the block.
+
+        The run is bound to the current context, and tools run on threads that
+        copy it, so concurrent requests - each in its own task - only ever see
+        their own run.
+
+        Yields:
+            ToolRun filled in by every tool call made inside the block
+        """
+        run = ToolRun()
+        outer = _current_run.get()
+        _current_run.set(run)
+        try:
+            yield run
+        finally:
+            # set() rather than reset(), which fails when an async generator
+            # holding the block is closed from another task
+            _current_run.set(outer)
@@ -1,29 +1,16 @@
 import pytest
-import sys
 import os
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import Mock, AsyncMock
+from types import SimpleNamespace
 from typing import Dict, Any, List
-from fastapi.testclient import TestClient
-import tempfile
-import shutil
-
-# Add the backend directory to the Python path for imports
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from models import Course, Lesson, CourseChunk
 from vector_store import SearchResults
 
-# Test Configuration
-pytest.main_config = {
-    "testpaths": ["tests"],
-    "python_files": ["test_*.py"],
-    "python_classes": ["Test*"],
-    "python_functions": ["test_*"]
-}
-
 # Sample Test Data Fixtures
+# These are immutable test data, so they are built once per session
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_course():
     """Sample course data for testing"""
     lessons = [
@@ -38,7 +25,7 @@ def sample_course():
         lessons=lessons
     )
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_course_chunks():
     """Sample course chunks for testing"""
     return [
@@ -62,7 +49,7 @@ def sample_course_chunks():
         )
     ]
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_search_results():
     """Sample search results for testing"""
     return SearchResults(
@@ -77,7 +64,7 @@ def sample_search_results():
         distances=[0.2, 0.4]
     )
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def empty_search_results():
     """Empty search results for testing"""
     return SearchResults(
@@ -86,16 +73,36 @@ def empty_search_results():
         distances=[]
     )
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def error_search_results():
     """Search results with error for testing"""
     return SearchResults.empty("Test error message")
 
 # Mock Fixtures
+# Mocks that tests assert call counts on are built once per session from a
+# template and reset (including configured return values) before every test
 
-@pytest.fixture
-def mock_vector_store():
-    """Mock vector store for testing"""
+def _configure_tool_manager(mock):
+    """Apply default return values to a tool manager mock"""
+    mock.get_tool_definitions.return_value = []
+    mock.execute_tool.return_value = "Mock tool result"
+
+def _configure_rag_system(mock):
+    """Apply default return values to a RAG system mock"""
+    mock.query.return_value = ("Test response", [{"text": "Test source", "link": "http://test.com"}])
+    mock.get_course_analytics.return_value = {"total_courses": 2, "course_titles": ["Test Course 1", "Test Course 2"]}
+    mock.session_manager.create_session.return_value = "test_session_id"
+
+    async def query_stream(query, session_id=None):
+        yield {"type": "delta", "text": "Test "}
+        yield {"type": "delta", "text": "response"}
+        yield {"type": "sources", "sources": [{"text": "Test source", "link": "http://test.com"}]}
+
+    mock.query_stream.side_effect = query_stream
+
+@pytest.fixture(scope="session")
+def vector_store_template():
+    """Session-wide vector store mock, reset before each test"""
     mock = Mock()
     mock.search = Mock()
     mock.get_lesson_link = Mock()
@@ -103,48 +110,98 @@ def mock_vector_store():
     mock.course_catalog = Mock()
     return mock
 
-@pytest.fixture 
-def mock_anthropic_client():
-    """Mock Anthropic client for testing"""
+@pytest.fixture(scope="session")
+def anthropic_client_template():
+    """Session-wide Anthropic client mock, reset before each test"""
+    return AsyncMock()
+
+@pytest.fixture(scope="session")
+def tool_manager_template():
+    """Session-wide tool manager mock, reset before each test"""
+    mock = Mock()
+    mock.get_tool_definitions = Mock()
+    mock.execute_tool = Mock()
+    _configure_tool_manager(mock)
+    return mock
+
+@pytest.fixture(scope="session")
+def rag_system_template():
+    """Session-wide RAG system mock, reset before each test"""
     mock = Mock()
-    mock.messages = Mock()
-    mock.messages.create = Mock()
+    mock.query = AsyncMock()
+    mock.query_stream = Mock()
+    mock.get_course_analytics = Mock()
+    mock.session_manager = Mock()
+    mock.session_manager.create_session = Mock()
+    mock.session_manager.clear_session = Mock()
+    _configure_rag_system(mock)
     return mock
 
+@pytest.fixture(autouse=True)
+def _reset_mock_templates(vector_store_template, anthropic_client_template, tool_manager_template, rag_system_template):
+    """Reset shared mocks so no calls or configuration leak between tests"""
+    for mock in (vector_store_template, anthropic_client_template, tool_manager_template, rag_system_template):
+        mock.reset_mock(return_value=True, side_effect=True)
+    _configure_tool_manager(tool_manager_template)
+    _configure_rag_system(rag_system_template)
+
+@pytest.fixture(scope="session")
+def patched_anthropic(anthropic_client_template):
+    """Replace the Anthropic client class once per session so every client is the shared mock"""
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setattr("anthropic.AsyncAnthropic", lambda **kwargs: anthropic_client_template)
+    yield anthropic_client_template
+    monkeypatch.undo()
+
+@pytest.fixture(scope="session")
+def _shared_ai_generator(patched_anthropic):
+    """Single AIGenerator built on the patched client"""
+    from ai_generator import AIGenerator
+    return AIGenerator("test_api_key", "test-model")
+
 @pytest.fixture
+def ai_generator(_shared_ai_generator):
+    """AIGenerator whose client mock is reset before each test"""
+    return _shared_ai_generator
+
+@pytest.fixture
+def mock_vector_store(vector_store_template):
+    """Mock vector store for testing"""
+    return vector_store_template
+
+@pytest.fixture 
+def mock_anthropic_client(anthropic_client_template):
+    """Mock Anthropic client for testing"""
+    return anthropic_client_template
+
+# API responses are plain read-only data, so they are built once per session
+# as SimpleNamespace objects rather than Mocks
+
+@pytest.fixture(scope="session")
 def mock_anthropic_response():
     """Mock Anthropic API response for testing"""
-    mock_response = Mock()
-    mock_response.content = [Mock()]
-    mock_response.content[0].text = "Test AI response"
-    mock_response.stop_reason = "end_turn"
-    return mock_response
+    return SimpleNamespace(
+        content=[SimpleNamespace(type="text", text="Test AI response")],
+        stop_reason="end_turn",
+    )
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_anthropic_tool_response():
     """Mock Anthropic API response with tool use"""
-    mock_response = Mock()
-    mock_content_block = Mock()
-    mock_content_block.type = "tool_use"
-    mock_content_block.name = "search_course_content"
-    mock_content_block.input = {"query": "test query"}
-    mock_content_block.id = "test_tool_id"
-    
-    mock_response.content = [mock_content_block]
-    mock_response.stop_reason = "tool_use"
-    return mock_response
+    mock_content_block = SimpleNamespace(
+        type="tool_use",
+        name="search_course_content",
+        input={"query": "test query"},
+        id="test_tool_id",
+    )
+    return SimpleNamespace(content=[mock_content_block], stop_reason="tool_use")
 
 @pytest.fixture
-def mock_tool_manager():
+def mock_tool_manager(tool_manager_template):
     """Mock tool manager for testing"""
-    mock = Mock()
-    mock.get_tool_definitions = Mock(return_value=[])
-    mock.execute_tool = Mock(return_value="Mock tool result")
-    mock.get_last_sources = Mock(return_value=[])
-    mock.reset_sources = Mock()
-    return mock
+    return tool_manager_template
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_config():
     """Mock configuration for testing"""
     mock = Mock()
@@ -156,29 +213,29 @@ def mock_config():
     mock.EMBEDDING_MODEL = "test-embedding-model"
     mock.CHROMA_PATH = "./test_chroma_db"
     mock.MAX_HISTORY = 2
+    mock.RESPONSE_CACHE_SIZE = 100
+    mock.RESPONSE_CACHE_TTL = 300
+    mock.BATCH_POLL_INTERVAL = 0
     return mock
 
 # API Testing Fixtures
 
 @pytest.fixture
-def mock_rag_system():
+def mock_rag_system(rag_system_template):
     """Mock RAG system for API testing"""
-    mock = Mock()
-    mock.query = Mock(return_value=("Test response", [{"text": "Test source", "link": "http://test.com"}]))
-    mock.get_course_analytics = Mock(return_value={"total_courses": 2, "course_titles": ["Test Course 1", "Test Course 2"]})
-    mock.session_manager = Mock()
-    mock.session_manager.create_session = Mock(return_value="test_session_id")
-    mock.session_manager.clear_session = Mock()
-    return mock
+    return rag_system_template
 
-@pytest.fixture
-def test_app(mock_rag_system):
-    """FastAPI test application with mocked dependencies"""
+@pytest.fixture(scope="session")
+def test_app(rag_system_template):
+    """FastAPI test application with mocked dependencies, built once per session"""
+    mock_rag_system = rag_system_template
     from fastapi import FastAPI
     from fastapi.middleware.cors import CORSMiddleware
     from fastapi.middleware.trustedhost import TrustedHostMiddleware
+    from fastapi.responses import StreamingResponse
     from pydantic import BaseModel
     from typing import List, Optional
+    import json
     
     # Create test app without static file mounting to avoid filesystem issues
     app = FastAPI(title="Course Materials RAG System - Test", root_path="")
@@ -227,7 +284,7 @@ def test_app(mock_rag_system):
             if not session_id:
                 session_id = mock_rag_system.session_manager.create_session()
             
-            answer, sources = mock_rag_system.query(request.query, session_id)
+            answer, sources = await mock_rag_system.query(request.query, session_id)
             
             source_items = []
             for source in sources:
@@ -245,6 +302,31 @@ def test_app(mock_rag_system):
             from fastapi import HTTPException
             raise HTTPException(status_code=500, detail=str(e))
 
+    @app.post("/api/query/stream")
+    async def query_documents_stream(request: QueryRequest):
+        session_id = request.session_id
+        if not session_id:
+            session_id = mock_rag_system.session_manager.create_session()
+
+        async def event_stream():
+            yield f"data: {json.dumps({'type': 'session', 'session_id': session_id})}\n\n"
+            try:
+                async for event in mock_rag_system.query_stream(request.query, session_id):
+                    if event["type"] == "sources":
+                        event = {
+                            "type": "sources",
+                            "sources": [
+                                {"text": s.get('text', ''), "link": s.get('link')} if isinstance(s, dict)
+                                else {"text": str(s), "link": None}
+                                for s in event["sources"]
+                            ],
+                        }
+                    yield f"data: {json.dumps(event)}\n\n"
+            except Exception as e:
+                yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
     @app.get("/api/courses", response_model=CourseStats)
     async def get_course_stats():
         try:
@@ -276,13 +358,18 @@ def test_app(mock_rag_system):
     return app
 
 @pytest.fixture
-def client(test_app):
-    """Test client for API endpoints"""
-    return TestClient(test_app)
+async def client(test_app):
+    """Async client that serves the test app in-process over ASGI"""
+    from httpx import ASGITransport, AsyncClient
+    async with AsyncClient(transport=ASGITransport(app=test_app), base_url="http://test") as async_client:
+        yield async_client
 
 @pytest.fixture
 def temp_docs_dir():
     """Temporary directory with test documents"""
+    import tempfile
+    import shutil
+
     temp_dir = tempfile.mkdtemp()
     
     # Create a test document
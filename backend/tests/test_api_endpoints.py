@@ -1,26 +1,32 @@
 import pytest
-from fastapi.testclient import TestClient
 import json
 
+# Deterministic edge-case payloads, encoded once so requests send them as-is
+LONG_QUERY = "test " * 1000  # 5000 character query
+LONG_PAYLOAD = json.dumps({"query": LONG_QUERY}).encode()
+UNICODE_QUERY = "What is 测试? Explain αβγδε and 🚀🔥💯"
+UNICODE_PAYLOAD = json.dumps({"query": UNICODE_QUERY}).encode()
+JSON_HEADERS = {"Content-Type": "application/json"}
+
 
 @pytest.mark.api
 class TestAPIEndpoints:
     """Test suite for FastAPI endpoints"""
     
-    def test_root_endpoint(self, client):
+    async def test_root_endpoint(self, client):
         """Test root endpoint returns welcome message"""
-        response = client.get("/")
+        response = await client.get("/")
         assert response.status_code == 200
         data = response.json()
         assert "message" in data
         assert data["message"] == "RAG System Test API"
     
-    def test_query_endpoint_with_new_session(self, client):
+    async def test_query_endpoint_with_new_session(self, client):
         """Test /api/query endpoint creates new session when none provided"""
         query_data = {
             "query": "What is software testing?"
         }
-        response = client.post("/api/query", json=query_data)
+        response = await client.post("/api/query", json=query_data)
         
         assert response.status_code == 200
         data = response.json()
@@ -44,35 +50,53 @@ class TestAPIEndpoints:
         assert source["text"] == "Test source"
         assert source["link"] == "http://test.com"
     
-    def test_query_endpoint_with_existing_session(self, client):
+    async def test_query_endpoint_with_existing_session(self, client):
         """Test /api/query endpoint uses provided session_id"""
         query_data = {
             "query": "Explain unit testing",
             "session_id": "existing_session_123"
         }
-        response = client.post("/api/query", json=query_data)
+        response = await client.post("/api/query", json=query_data)
         
         assert response.status_code == 200
         data = response.json()
         assert data["session_id"] == "existing_session_123"
     
-    def test_query_endpoint_missing_query(self, client):
+    async def test_query_stream_endpoint(self, client):
+        """Test /api/query/stream sends session, text deltas and sources as SSE events"""
+        response = await client.post("/api/query/stream", json={"query": "What is software testing?"})
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [
+            json.loads(line.removeprefix("data: "))
+            for line in response.text.split("\n\n") if line
+        ]
+        
+        assert events[0] == {"type": "session", "session_id": "test_session_id"}
+        assert "".join(e["text"] for e in events if e["type"] == "delta") == "Test response"
+        assert events[-1] == {
+            "type": "sources",
+            "sources": [{"text": "Test source", "link": "http://test.com"}]
+        }
+    
+    async def test_query_endpoint_missing_query(self, client):
         """Test /api/query endpoint returns 422 for missing query"""
-        response = client.post("/api/query", json={})
+        response = await client.post("/api/query", json={})
         assert response.status_code == 422
     
-    def test_query_endpoint_invalid_json(self, client):
+    async def test_query_endpoint_invalid_json(self, client):
         """Test /api/query endpoint handles invalid JSON"""
-        response = client.post(
+        response = await client.post(
             "/api/query",
-            data="invalid json",
+            content="invalid json",
             headers={"content-type": "application/json"}
         )
         assert response.status_code == 422
     
-    def test_courses_endpoint(self, client):
+    async def test_courses_endpoint(self, client):
         """Test /api/courses endpoint returns course statistics"""
-        response = client.get("/api/courses")
+        response = await client.get("/api/courses")
         
         assert response.status_code == 200
         data = response.json()
@@ -89,12 +113,12 @@ class TestAPIEndpoints:
         assert "Test Course 1" in data["course_titles"]
         assert "Test Course 2" in data["course_titles"]
     
-    def test_clear_session_endpoint(self, client):
+    async def test_clear_session_endpoint(self, client):
         """Test /api/sessions/clear endpoint clears session"""
         clear_data = {
             "session_id": "test_session_to_clear"
         }
-        response = client.post("/api/sessions/clear", json=clear_data)
+        response = await client.post("/api/sessions/clear", json=clear_data)
         
         assert response.status_code == 200
         data = response.json()
@@ -108,14 +132,14 @@ class TestAPIEndpoints:
         assert "cleared successfully" in data["message"]
         assert "test_session_to_clear" in data["message"]
     
-    def test_clear_session_endpoint_missing_session_id(self, client):
+    async def test_clear_session_endpoint_missing_session_id(self, client):
         """Test /api/sessions/clear endpoint returns 422 for missing session_id"""
-        response = client.post("/api/sessions/clear", json={})
+        response = await client.post("/api/sessions/clear", json={})
         assert response.status_code == 422
     
-    def test_nonexistent_endpoint(self, client):
+    async def test_nonexistent_endpoint(self, client):
         """Test accessing nonexistent endpoint returns 404"""
-        response = client.get("/api/nonexistent")
+        response = await client.get("/api/nonexistent")
         assert response.status_code == 404
 
 
@@ -123,38 +147,48 @@ class TestAPIEndpoints:
 class TestAPIEndpointErrors:
     """Test suite for API endpoint error handling"""
     
-    def test_query_endpoint_with_exception(self, client, mock_rag_system):
+    async def test_query_endpoint_with_exception(self, client, mock_rag_system):
         """Test /api/query endpoint handles RAG system exceptions"""
         # Configure mock to raise exception
         mock_rag_system.query.side_effect = Exception("Test error")
         
         query_data = {"query": "test query"}
-        response = client.post("/api/query", json=query_data)
+        response = await client.post("/api/query", json=query_data)
         
         assert response.status_code == 500
         data = response.json()
         assert "detail" in data
         assert data["detail"] == "Test error"
     
-    def test_courses_endpoint_with_exception(self, client, mock_rag_system):
+    async def test_query_stream_endpoint_with_exception(self, client, mock_rag_system):
+        """Test /api/query/stream reports RAG system exceptions as an error event"""
+        mock_rag_system.query_stream.side_effect = Exception("Test error")
+        
+        response = await client.post("/api/query/stream", json={"query": "test query"})
+        
+        assert response.status_code == 200
+        last_event = response.text.strip().split("\n\n")[-1]
+        assert json.loads(last_event.removeprefix("data: ")) == {"type": "error", "detail": "Test error"}
+    
+    async def test_courses_endpoint_with_exception(self, client, mock_rag_system):
         """Test /api/courses endpoint handles RAG system exceptions"""
         # Configure mock to raise exception
         mock_rag_system.get_course_analytics.side_effect = Exception("Analytics error")
         
-        response = client.get("/api/courses")
+        response = await client.get("/api/courses")
         
         assert response.status_code == 500
         data = response.json()
         assert "detail" in data
         assert data["detail"] == "Analytics error"
     
-    def test_clear_session_endpoint_with_exception(self, client, mock_rag_system):
+    async def test_clear_session_endpoint_with_exception(self, client, mock_rag_system):
         """Test /api/sessions/clear endpoint handles session manager exceptions"""
         # Configure mock to raise exception
         mock_rag_system.session_manager.clear_session.side_effect = Exception("Session error")
         
         clear_data = {"session_id": "test_session"}
-        response = client.post("/api/sessions/clear", json=clear_data)
+        response = await client.post("/api/sessions/clear", json=clear_data)
         
         assert response.status_code == 500
         data = response.json()
@@ -166,53 +200,71 @@ class TestAPIEndpointErrors:
 class TestAPIDataValidation:
     """Test suite for API data validation"""
     
-    def test_query_endpoint_empty_string_query(self, client):
+    async def test_query_endpoint_empty_string_query(self, client):
         """Test /api/query endpoint handles empty string query"""
         query_data = {"query": ""}
-        response = client.post("/api/query", json=query_data)
+        response = await client.post("/api/query", json=query_data)
         
         # Should still work with empty query - the validation allows it
         assert response.status_code == 200
     
-    def test_query_endpoint_very_long_query(self, client):
+    async def test_query_endpoint_very_long_query(self, client, mock_rag_system):
         """Test /api/query endpoint handles very long query"""
-        long_query = "test " * 1000  # 5000 character query
-        query_data = {"query": long_query}
-        response = client.post("/api/query", json=query_data)
+        response = await client.post("/api/query", content=LONG_PAYLOAD, headers=JSON_HEADERS)
         
         assert response.status_code == 200
         data = response.json()
         assert "answer" in data
+        assert mock_rag_system.query.call_args[0][0] == LONG_QUERY
     
-    def test_query_endpoint_with_unicode(self, client):
+    async def test_query_endpoint_with_unicode(self, client, mock_rag_system):
         """Test /api/query endpoint handles Unicode characters"""
-        query_data = {"query": "What is 测试? Explain αβγδε and 🚀🔥💯"}
-        response = client.post("/api/query", json=query_data)
+        response = await client.post("/api/query", content=UNICODE_PAYLOAD, headers=JSON_HEADERS)
         
         assert response.status_code == 200
         data = response.json()
         assert "answer" in data
+        assert mock_rag_system.query.call_args[0][0] == UNICODE_QUERY
     
-    def test_clear_session_empty_session_id(self, client):
+    async def test_clear_session_empty_session_id(self, client):
         """Test /api/sessions/clear endpoint handles empty session_id"""
         clear_data = {"session_id": ""}
-        response = client.post("/api/sessions/clear", json=clear_data)
+        response = await client.post("/api/sessions/clear", json=clear_data)
         
         # Should still work with empty session_id
         assert response.status_code == 200
 
 
+# Answer whose sources mix the dict and legacy string formats
+MIXED_SOURCES_RESPONSE = ("Test answer", [
+    {"text": "Dict source", "link": "http://example.com"},
+    "String source",
+    {"text": "Dict without link"}
+])
+
+
+@pytest.fixture
+async def mixed_sources_response(client, mock_rag_system):
+    """Sources returned by /api/query for mixed source formats"""
+    mock_rag_system.query.return_value = MIXED_SOURCES_RESPONSE
+    
+    response = await client.post("/api/query", json={"query": "test"})
+    
+    assert response.status_code == 200
+    return response.json()["sources"]
+
+
 @pytest.mark.api
 class TestAPIResponseFormats:
     """Test suite for API response format consistency"""
     
-    def test_query_response_with_string_sources(self, client, mock_rag_system):
+    async def test_query_response_with_string_sources(self, client, mock_rag_system):
         """Test /api/query handles legacy string source format"""
         # Configure mock to return string sources instead of dict
         mock_rag_system.query.return_value = ("Test answer", ["Source 1", "Source 2"])
         
         query_data = {"query": "test"}
-        response = client.post("/api/query", json=query_data)
+        response = await client.post("/api/query", json=query_data)
         
         assert response.status_code == 200
         data = response.json()
@@ -224,27 +276,15 @@ class TestAPIResponseFormats:
         assert data["sources"][1]["text"] == "Source 2"
         assert data["sources"][1]["link"] is None
     
-    def test_query_response_with_mixed_sources(self, client, mock_rag_system):
-        """Test /api/query handles mixed source formats"""
-        # Configure mock to return mixed source formats
-        mixed_sources = [
-            {"text": "Dict source", "link": "http://example.com"},
-            "String source",
-            {"text": "Dict without link"}
-        ]
-        mock_rag_system.query.return_value = ("Test answer", mixed_sources)
-        
-        query_data = {"query": "test"}
-        response = client.post("/api/query", json=query_data)
-        
-        assert response.status_code == 200
-        data = response.json()
-        
-        # Should handle all source formats correctly
-        assert len(data["sources"]) == 3
-        assert data["sources"][0]["text"] == "Dict source"
-        assert data["sources"][0]["link"] == "http://example.com"
-        assert data["sources"][1]["text"] == "String source"
-        assert data["sources"][1]["link"] is None
-        assert data["sources"][2]["text"] == "Dict without link"
-        assert data["sources"][2]["link"] is None
\ No newline at end of file
+    def test_query_response_with_mixed_sources_count(self, mixed_sources_response):
+        """Test /api/query keeps every source when formats are mixed"""
+        assert len(mixed_sources_response) == 3
+    
+    @pytest.mark.parametrize("idx,expected", [
+        (0, {"text": "Dict source", "link": "http://example.com"}),
+        (1, {"text": "String source", "link": None}),
+        (2, {"text": "Dict without link", "link": None}),
+    ])
+    def test_query_response_with_mixed_sources(self, mixed_sources_response, idx, expected):
+        """Test /api/query converts each mixed-format source to a SourceItem"""
+        assert mixed_sources_response[idx] == expected
\ No newline at end of file
@@ -0,0 +1,79 @@
+import functools
+import os
+
+import pytest
+from config import config
+from search_tools import CourseSearchTool, ToolManager
+from vector_store import VectorStore
+
+# The app runs from backend/, so CHROMA_PATH is relative to that directory
+CHROMA_PATH = os.path.join(os.path.dirname(__file__), "..", config.CHROMA_PATH)
+
+# These tests need the seeded database, so skip the whole module without it
+if not os.path.exists(CHROMA_PATH):
+    pytest.skip(
+        "ChromaDB not initialized - start the app once to load docs/",
+        allow_module_level=True,
+    )
+
+# A course and lesson from docs/course1_script.txt
+COURSE_TITLE = "Building Towards Computer Use with Anthropic"
+LESSON_NUMBER = 0
+
+
+def _assert_dict_sources(sources):
+    """Sources are {"text", "link"} dicts and at least one carries a lesson link"""
+    assert sources, "No sources generated"
+    assert all("text" in source and "link" in source for source in sources)
+    assert any(source["link"] for source in sources)
+
+
+@pytest.fixture(scope="session")
+def vector_store():
+    """VectorStore over the real ChromaDB, opened once per session
+
+    Search results return several chunks per lesson, and the catalog does not
+    change while tests run, so lesson link lookups are memoized on the instance.
+    """
+    store = VectorStore(CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS)
+    store.get_lesson_link = functools.lru_cache(maxsize=256)(store.get_lesson_link)
+    return store
+
+
+@pytest.fixture(scope="session")
+def search_tool(vector_store):
+    """CourseSearchTool over the shared vector store"""
+    return CourseSearchTool(vector_store)
+
+
+@pytest.mark.integration
+@pytest.mark.xdist_group(name="chroma_io")
+class TestClickableSources:
+    """Lesson links flow from the loaded course catalog into search sources"""
+
+    def test_lesson_link_retrieval(self, vector_store):
+        """Test lesson links are stored with the course catalog"""
+        lesson_link = vector_store.get_lesson_link(COURSE_TITLE, LESSON_NUMBER)
+
+        assert lesson_link, f"No link for {COURSE_TITLE} lesson {LESSON_NUMBER}"
+        assert lesson_link.startswith("https://")
+
+    @pytest.mark.parametrize(
+        "query,course_name",
+        [
+            pytest.param("computer use", COURSE_TITLE, id="course_filter"),
+            pytest.param("computer use introduction", None, id="all_courses"),
+        ],
+    )
+    def test_search_tool_sources(self, vector_store, search_tool, query, course_name):
+        """Test search results produce structured sources with lesson links"""
+        with ToolManager().tool_run() as run:
+            result = search_tool.execute(query, course_name=course_name)
+
+        assert result
+        _assert_dict_sources(run.sources)
+
+        # A repeated search resolves its lesson links from the memo
+        hits = vector_store.get_lesson_link.cache_info().hits
+        search_tool.execute(query, course_name=course_name)
+        assert vector_store.get_lesson_link.cache_info().hits > hits
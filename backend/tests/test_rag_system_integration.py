@@ -1,7 +1,41 @@
+import asyncio
 import pytest
-from unittest.mock import Mock, patch, MagicMock
-import os
+from contextlib import nullcontext
+from unittest.mock import patch, DEFAULT
 from rag_system import RAGSystem
+from search_tools import CourseSearchTool, ToolManager, ToolRun
+from vector_store import SearchResults
+
+
+@pytest.fixture(scope="class")
+def rag_mocks():
+    """Patch every RAGSystem dependency once per class, yielding the class mocks by name
+
+    The mocks are autospecced, so async methods are AsyncMocks and calls are
+    checked against the real signatures.
+    """
+    patcher = patch.multiple(
+        "rag_system",
+        autospec=True,
+        DocumentProcessor=DEFAULT,
+        VectorStore=DEFAULT,
+        AIGenerator=DEFAULT,
+        SessionManager=DEFAULT,
+        ToolManager=DEFAULT,
+        CourseSearchTool=DEFAULT,
+        CourseOutlineTool=DEFAULT,
+    )
+    mocks = patcher.start()
+    yield mocks
+    patcher.stop()
+
+
+@pytest.fixture(autouse=True)
+def _reset_rag_mocks(rag_mocks):
+    """Reset the patched classes and their spec'd instances so no configuration leaks"""
+    for mock in rag_mocks.values():
+        mock.reset_mock()
+        mock.return_value.reset_mock(return_value=True, side_effect=True)
 
 
 class TestRAGSystemIntegration:
@@ -10,63 +44,41 @@ class TestRAGSystemIntegration:
     @pytest.fixture
     def rag_system(self, mock_config):
         """Create RAGSystem instance with mocked dependencies"""
-        with (
-            patch("rag_system.DocumentProcessor"),
-            patch("rag_system.VectorStore"),
-            patch("rag_system.AIGenerator"),
-            patch("rag_system.SessionManager"),
-            patch("rag_system.ToolManager"),
-            patch("rag_system.CourseSearchTool"),
-            patch("rag_system.CourseOutlineTool"),
-        ):
-
-            rag_system = RAGSystem(mock_config)
-
-            # Properly mock the tool manager methods
-            rag_system.tool_manager.get_last_sources = Mock(return_value=[])
-            rag_system.tool_manager.get_tool_definitions = Mock(return_value=[])
-            rag_system.tool_manager.reset_sources = Mock()
-
-            return rag_system
-
-    def test_rag_system_initialization(self, mock_config):
+        rag_system = RAGSystem(mock_config)
+
+        # Tool definitions and sources must be plain data for the response cache
+        rag_system.tool_manager.tool_run.return_value = nullcontext(ToolRun(sources=[]))
+        rag_system.tool_manager.get_tool_definitions.return_value = []
+
+        return rag_system
+
+    def test_rag_system_initialization(self, rag_mocks, mock_config):
         """Test RAG system initializes all components correctly"""
-        with (
-            patch("rag_system.DocumentProcessor") as mock_doc_proc,
-            patch("rag_system.VectorStore") as mock_vector_store,
-            patch("rag_system.AIGenerator") as mock_ai_gen,
-            patch("rag_system.SessionManager") as mock_session_mgr,
-            patch("rag_system.ToolManager") as mock_tool_mgr,
-            patch("rag_system.CourseSearchTool") as mock_search_tool,
-            patch("rag_system.CourseOutlineTool") as mock_outline_tool,
-        ):
-
-            rag_system = RAGSystem(mock_config)
-
-            # Verify all components are initialized
-            mock_doc_proc.assert_called_once_with(
-                mock_config.CHUNK_SIZE, mock_config.CHUNK_OVERLAP
-            )
-            mock_vector_store.assert_called_once_with(
-                mock_config.CHROMA_PATH,
-                mock_config.EMBEDDING_MODEL,
-                mock_config.MAX_RESULTS,
-            )
-            mock_ai_gen.assert_called_once_with(
-                mock_config.ANTHROPIC_API_KEY, mock_config.ANTHROPIC_MODEL
-            )
-            mock_session_mgr.assert_called_once_with(mock_config.MAX_HISTORY)
+        rag_system = RAGSystem(mock_config)
 
-            # Verify tools are registered
-            assert rag_system.tool_manager.register_tool.call_count == 2
+        # Verify all components are initialized
+        rag_mocks["DocumentProcessor"].assert_called_once_with(
+            mock_config.CHUNK_SIZE, mock_config.CHUNK_OVERLAP
+        )
+        rag_mocks["VectorStore"].assert_called_once_with(
+            mock_config.CHROMA_PATH,
+            mock_config.EMBEDDING_MODEL,
+            mock_config.MAX_RESULTS,
+        )
+        rag_mocks["AIGenerator"].assert_called_once_with(
+            mock_config.ANTHROPIC_API_KEY, mock_config.ANTHROPIC_MODEL
+        )
+        rag_mocks["SessionManager"].assert_called_once_with(mock_config.MAX_HISTORY)
+
+        # Verify tools are registered
+        assert rag_system.tool_manager.register_tool.call_count == 2
 
-    @patch("os.path.exists")
     def test_add_course_document_success(
-        self, mock_exists, rag_system, sample_course, sample_course_chunks
+        self, fs, rag_system, sample_course, sample_course_chunks
     ):
         """Test successful course document addition"""
         # Setup
-        mock_exists.return_value = True
+        fs.create_file("test_course.txt")
         rag_system.document_processor.process_course_document.return_value = (
             sample_course,
             sample_course_chunks,
@@ -99,23 +111,14 @@ class TestRAGSystemIntegration:
         assert course is None
         assert chunk_count == 0
 
-    @patch("os.listdir")
-    @patch("os.path.exists")
-    @patch("os.path.isfile")
     def test_add_course_folder_success(
-        self,
-        mock_isfile,
-        mock_exists,
-        mock_listdir,
-        rag_system,
-        sample_course,
-        sample_course_chunks,
+        self, fs, rag_system, sample_course, sample_course_chunks
     ):
         """Test successful course folder processing"""
         # Setup
-        mock_exists.return_value = True
-        mock_listdir.return_value = ["course1.txt", "course2.pdf", "not_a_course.jpg"]
-        mock_isfile.side_effect = lambda path: path.endswith((".txt", ".pdf"))
+        fs.create_file("test_folder/course1.txt")
+        fs.create_file("test_folder/course2.pdf")
+        fs.create_file("test_folder/not_a_course.jpg")
 
         rag_system.vector_store.get_existing_course_titles.return_value = []
 
@@ -163,15 +166,12 @@ class TestRAGSystemIntegration:
         assert chunks_added == 2  # 1 chunk from each course
         assert rag_system.document_processor.process_course_document.call_count == 2
 
-    @patch("os.listdir")
-    @patch("os.path.exists")
     def test_add_course_folder_skip_existing_courses(
-        self, mock_exists, mock_listdir, rag_system, sample_course, sample_course_chunks
+        self, fs, rag_system, sample_course, sample_course_chunks
     ):
         """Test that existing courses are skipped"""
         # Setup
-        mock_exists.return_value = True
-        mock_listdir.return_value = ["course1.txt"]
+        fs.create_file("test_folder/course1.txt")
 
         # Existing course titles include our sample course
         rag_system.vector_store.get_existing_course_titles.return_value = [
@@ -182,21 +182,16 @@ class TestRAGSystemIntegration:
             sample_course_chunks,
         )
 
-        with patch("os.path.isfile", return_value=True):
-            # Execute
-            courses_added, chunks_added = rag_system.add_course_folder("test_folder")
+        # Execute
+        courses_added, chunks_added = rag_system.add_course_folder("test_folder")
 
         # Verify no courses were added (skipped existing)
         assert courses_added == 0
         assert chunks_added == 0
         rag_system.vector_store.add_course_metadata.assert_not_called()
 
-    @patch("os.path.exists")
-    def test_add_course_folder_nonexistent_folder(self, mock_exists, rag_system):
+    def test_add_course_folder_nonexistent_folder(self, fs, rag_system):
         """Test handling of nonexistent folder"""
-        # Setup
-        mock_exists.return_value = False
-
         # Execute
         courses_added, chunks_added = rag_system.add_course_folder("nonexistent_folder")
 
@@ -204,29 +199,27 @@ class TestRAGSystemIntegration:
         assert courses_added == 0
         assert chunks_added == 0
 
-    def test_add_course_folder_clear_existing(self, rag_system):
+    def test_add_course_folder_clear_existing(self, fs, rag_system):
         """Test clearing existing data when flag is set"""
-        with (
-            patch("os.path.exists", return_value=True),
-            patch("os.listdir", return_value=[]),
-        ):
+        # Setup
+        fs.create_dir("test_folder")
 
-            # Execute
-            rag_system.add_course_folder("test_folder", clear_existing=True)
+        # Execute
+        rag_system.add_course_folder("test_folder", clear_existing=True)
 
-            # Verify data was cleared
-            rag_system.vector_store.clear_all_data.assert_called_once()
+        # Verify data was cleared
+        rag_system.vector_store.clear_all_data.assert_called_once()
 
-    def test_query_without_session(self, rag_system):
+    async def test_query_without_session(self, rag_system):
         """Test query processing without session context"""
         # Setup
         rag_system.ai_generator.generate_response.return_value = "Test response"
-        rag_system.tool_manager.get_last_sources.return_value = [
-            {"text": "Test Course", "link": None}
-        ]
+        rag_system.tool_manager.tool_run.return_value = nullcontext(
+            ToolRun(sources=[{"text": "Test Course", "link": None}])
+        )
 
         # Execute
-        response, sources = rag_system.query("What is machine learning?")
+        response, sources = await rag_system.query("What is machine learning?")
 
         # Verify
         assert response == "Test response"
@@ -235,17 +228,22 @@ class TestRAGSystemIntegration:
 
         # Verify AI generator was called correctly
         rag_system.ai_generator.generate_response.assert_called_once()
-        call_args = rag_system.ai_generator.generate_response.call_args[1]
-        assert "What is machine learning?" in call_args["query"]
-        assert call_args["conversation_history"] is None
-        assert call_args["tools"] == rag_system.tool_manager.get_tool_definitions()
-        assert call_args["tool_manager"] == rag_system.tool_manager
+        kwargs = rag_system.ai_generator.generate_response.call_args.kwargs
+        assert "What is machine learning?" in kwargs["query"]
+        assert kwargs["conversation_history"] is None
+        assert (
+            kwargs["tools"] == rag_system.tool_manager.get_tool_definitions.return_value
+        )
+        assert kwargs["tool_manager"] == rag_system.tool_manager
 
-    def test_query_with_session(self, rag_system):
+    async def test_query_with_session(self, rag_system):
         """Test query processing with session context"""
         # Setup
         session_id = "test_session_123"
-        conversation_history = "User: Previous question\nAssistant: Previous answer"
+        conversation_history = [
+            {"role": "user", "content": "Previous question"},
+            {"role": "assistant", "content": "Previous answer"},
+        ]
 
         rag_system.session_manager.get_conversation_history.return_value = (
             conversation_history
@@ -253,10 +251,10 @@ class TestRAGSystemIntegration:
         rag_system.ai_generator.generate_response.return_value = (
             "Context-aware response"
         )
-        rag_system.tool_manager.get_last_sources.return_value = []
+        rag_system.tool_manager.tool_run.return_value = nullcontext(ToolRun(sources=[]))
 
         # Execute
-        response, sources = rag_system.query(
+        response, sources = await rag_system.query(
             "Follow up question", session_id=session_id
         )
 
@@ -272,25 +270,34 @@ class TestRAGSystemIntegration:
         )
 
         # Verify AI generator received conversation history
-        call_args = rag_system.ai_generator.generate_response.call_args[1]
-        assert call_args["conversation_history"] == conversation_history
+        kwargs = rag_system.ai_generator.generate_response.call_args.kwargs
+        assert kwargs["conversation_history"] == conversation_history
 
-    def test_query_with_tool_usage(self, rag_system):
+    async def test_query_with_tool_usage(self, rag_system):
         """Test query processing that triggers tool usage"""
         # Setup to simulate tool usage
         rag_system.ai_generator.generate_response.return_value = (
             "Answer based on search results"
         )
-        rag_system.tool_manager.get_last_sources.return_value = [
-            {"text": "Test Course - Lesson 1", "link": "https://example.com/lesson/1"},
-            {
-                "text": "Another Course - Lesson 2",
-                "link": "https://example.com/lesson/2",
-            },
-        ]
+        rag_system.tool_manager.tool_run.return_value = nullcontext(
+            ToolRun(
+                sources=[
+                    {
+                        "text": "Test Course - Lesson 1",
+                        "link": "https://example.com/lesson/1",
+                    },
+                    {
+                        "text": "Another Course - Lesson 2",
+                        "link": "https://example.com/lesson/2",
+                    },
+                ]
+            )
+        )
 
         # Execute
-        response, sources = rag_system.query("What does the course say about testing?")
+        response, sources = await rag_system.query(
+            "What does the course say about testing?"
+        )
 
         # Verify
         assert response == "Answer based on search results"
@@ -298,10 +305,45 @@ class TestRAGSystemIntegration:
         assert sources[0]["text"] == "Test Course - Lesson 1"
         assert sources[0]["link"] == "https://example.com/lesson/1"
 
-        # Verify sources were reset after retrieval
-        rag_system.tool_manager.reset_sources.assert_called_once()
+        # Verify sources were collected for this query alone
+        rag_system.tool_manager.tool_run.assert_called_once()
 
-    def test_query_course_specific_content(self, rag_system):
+    async def test_concurrent_queries_keep_their_own_sources(
+        self, rag_system, mock_vector_store
+    ):
+        """Test overlapping queries each return the sources of their own search"""
+        # Setup real tools over a fake store so sources take the production path
+        mock_vector_store.search.side_effect = lambda query, **filters: SearchResults(
+            documents=[f"{query} content"],
+            metadata=[{"course_title": f"{query} Course"}],
+            distances=[0.1],
+        )
+        rag_system.tool_manager = ToolManager()
+        rag_system.tool_manager.register_tool(CourseSearchTool(mock_vector_store))
+
+        # Both searches finish before either answer is returned
+        both_searched = asyncio.Barrier(2)
+
+        async def generate_response(query, conversation_history, tools, tool_manager):
+            topic = query.rsplit(": ", 1)[1]
+            await asyncio.to_thread(
+                tool_manager.execute_tool, "search_course_content", query=topic
+            )
+            await both_searched.wait()
+            return f"About {topic}"
+
+        rag_system.ai_generator.generate_response.side_effect = generate_response
+
+        # Execute
+        results = await asyncio.gather(rag_system.query("MCP"), rag_system.query("RAG"))
+
+        # Verify
+        assert results == [
+            ("About MCP", [{"text": "MCP Course", "link": None}]),
+            ("About RAG", [{"text": "RAG Course", "link": None}]),
+        ]
+
+    async def test_query_course_specific_content(self, rag_system):
         """Test query processing for course-specific content questions"""
         # Setup query that should trigger course search
         course_query = "Explain the testing concepts covered in the advanced course"
@@ -309,40 +351,40 @@ class TestRAGSystemIntegration:
         rag_system.ai_generator.generate_response.return_value = (
             "Course-specific response"
         )
-        rag_system.tool_manager.get_last_sources.return_value = [
-            {"text": "Advanced Course", "link": None}
-        ]
+        rag_system.tool_manager.tool_run.return_value = nullcontext(
+            ToolRun(sources=[{"text": "Advanced Course", "link": None}])
+        )
 
         # Execute
-        response, sources = rag_system.query(course_query)
+        response, sources = await rag_system.query(course_query)
 
         # Verify
         assert response == "Course-specific response"
 
         # Verify proper prompt format was used
-        call_args = rag_system.ai_generator.generate_response.call_args[1]
-        assert "Answer this question about course materials:" in call_args["query"]
-        assert course_query in call_args["query"]
+        kwargs = rag_system.ai_generator.generate_response.call_args.kwargs
+        assert "Answer this question about course materials:" in kwargs["query"]
+        assert course_query in kwargs["query"]
 
-    def test_query_general_knowledge(self, rag_system):
+    async def test_query_general_knowledge(self, rag_system):
         """Test query processing for general knowledge questions"""
         # Setup query that should NOT trigger tools
         general_query = "What is the capital of France?"
 
         rag_system.ai_generator.generate_response.return_value = "Paris"
-        rag_system.tool_manager.get_last_sources.return_value = []
+        rag_system.tool_manager.tool_run.return_value = nullcontext(ToolRun(sources=[]))
 
         # Execute
-        response, sources = rag_system.query(general_query)
+        response, sources = await rag_system.query(general_query)
 
         # Verify
         assert response == "Paris"
         assert len(sources) == 0
 
         # Verify AI generator still received tools (decision is made by AI)
-        call_args = rag_system.ai_generator.generate_response.call_args[1]
-        assert call_args["tools"] is not None
-        assert call_args["tool_manager"] is not None
+        kwargs = rag_system.ai_generator.generate_response.call_args.kwargs
+        assert kwargs["tools"] is not None
+        assert kwargs["tool_manager"] is not None
 
     def test_get_course_analytics(self, rag_system):
         """Test course analytics retrieval"""
@@ -362,70 +404,52 @@ class TestRAGSystemIntegration:
         assert len(analytics["course_titles"]) == 3
         assert "Course 1" in analytics["course_titles"]
 
-    def test_end_to_end_workflow_with_mocked_components(
-        self, mock_config, sample_course, sample_course_chunks
+    async def test_end_to_end_workflow_with_mocked_components(
+        self, fs, rag_mocks, mock_config, sample_course, sample_course_chunks
     ):
         """Test complete end-to-end workflow with carefully mocked components"""
-        with (
-            patch("rag_system.DocumentProcessor") as mock_doc_proc_class,
-            patch("rag_system.VectorStore") as mock_vector_store_class,
-            patch("rag_system.AIGenerator") as mock_ai_gen_class,
-            patch("rag_system.SessionManager") as mock_session_mgr_class,
-            patch("rag_system.ToolManager") as mock_tool_mgr_class,
-            patch("rag_system.CourseSearchTool"),
-            patch("rag_system.CourseOutlineTool"),
-        ):
-
-            # Setup mock instances
-            mock_doc_proc = Mock()
-            mock_vector_store = Mock()
-            mock_ai_gen = Mock()
-            mock_session_mgr = Mock()
-            mock_tool_mgr = Mock()
-
-            mock_doc_proc_class.return_value = mock_doc_proc
-            mock_vector_store_class.return_value = mock_vector_store
-            mock_ai_gen_class.return_value = mock_ai_gen
-            mock_session_mgr_class.return_value = mock_session_mgr
-            mock_tool_mgr_class.return_value = mock_tool_mgr
-
-            # Setup workflow
-            mock_doc_proc.process_course_document.return_value = (
-                sample_course,
-                sample_course_chunks,
-            )
-            mock_vector_store.get_existing_course_titles.return_value = []
-            mock_ai_gen.generate_response.return_value = "Comprehensive answer"
-            mock_tool_mgr.get_tool_definitions.return_value = [
-                {"name": "search_course_content"}
-            ]
-            mock_tool_mgr.get_last_sources.return_value = [
-                {"text": "Test Course", "link": None}
-            ]
-
-            # Create RAG system and simulate complete workflow
-            rag_system = RAGSystem(mock_config)
-
-            # 1. Add course document
-            with patch("os.path.exists", return_value=True):
-                course, chunks = rag_system.add_course_document("test_course.txt")
-                assert course == sample_course
-                assert chunks == len(sample_course_chunks)
-
-            # 2. Process query
-            response, sources = rag_system.query("What does the course teach?")
-            assert response == "Comprehensive answer"
-            assert len(sources) == 1
-
-            # Verify all components were used correctly
-            mock_doc_proc.process_course_document.assert_called()
-            mock_vector_store.add_course_metadata.assert_called()
-            mock_vector_store.add_course_content.assert_called()
-            mock_ai_gen.generate_response.assert_called()
-            mock_tool_mgr.get_last_sources.assert_called()
-            mock_tool_mgr.reset_sources.assert_called()
-
-    def test_error_handling_in_query_processing(self, rag_system):
+        # Setup mock instances
+        mock_doc_proc = rag_mocks["DocumentProcessor"].return_value
+        mock_vector_store = rag_mocks["VectorStore"].return_value
+        mock_ai_gen = rag_mocks["AIGenerator"].return_value
+        mock_tool_mgr = rag_mocks["ToolManager"].return_value
+
+        # Setup workflow
+        mock_doc_proc.process_course_document.return_value = (
+            sample_course,
+            sample_course_chunks,
+        )
+        mock_vector_store.get_existing_course_titles.return_value = []
+        mock_ai_gen.generate_response.return_value = "Comprehensive answer"
+        mock_tool_mgr.get_tool_definitions.return_value = [
+            {"name": "search_course_content"}
+        ]
+        mock_tool_mgr.tool_run.return_value = nullcontext(
+            ToolRun(sources=[{"text": "Test Course", "link": None}])
+        )
+
+        # Create RAG system and simulate complete workflow
+        rag_system = RAGSystem(mock_config)
+
+        # 1. Add course document
+        fs.create_file("test_course.txt")
+        course, chunks = rag_system.add_course_document("test_course.txt")
+        assert course == sample_course
+        assert chunks == len(sample_course_chunks)
+
+        # 2. Process query
+        response, sources = await rag_system.query("What does the course teach?")
+        assert response == "Comprehensive answer"
+        assert len(sources) == 1
+
+        # Verify all components were used correctly
+        mock_doc_proc.process_course_document.assert_called()
+        mock_vector_store.add_course_metadata.assert_called()
+        mock_vector_store.add_course_content.assert_called()
+        mock_ai_gen.generate_response.assert_called()
+        mock_tool_mgr.tool_run.assert_called()
+
+    async def test_error_handling_in_query_processing(self, rag_system):
         """Test error handling during query processing"""
         # Setup AI generator to raise exception
         rag_system.ai_generator.generate_response.side_effect = Exception(
@@ -434,18 +458,18 @@ class TestRAGSystemIntegration:
 
         # Execute - should not crash the system
         with pytest.raises(Exception, match="AI API error"):
-            rag_system.query("Test query")
+            await rag_system.query("Test query")
 
-    def test_session_management_integration(self, rag_system):
+    async def test_session_management_integration(self, rag_system):
         """Test session management throughout query processing"""
         session_id = "session_123"
 
         # First query
         rag_system.ai_generator.generate_response.return_value = "First response"
-        rag_system.tool_manager.get_last_sources.return_value = []
+        rag_system.tool_manager.tool_run.return_value = nullcontext(ToolRun(sources=[]))
         rag_system.session_manager.get_conversation_history.return_value = None
 
-        response1, _ = rag_system.query("First question", session_id=session_id)
+        response1, _ = await rag_system.query("First question", session_id=session_id)
 
         # Verify session was updated
         rag_system.session_manager.add_exchange.assert_called_with(
@@ -453,7 +477,10 @@ class TestRAGSystemIntegration:
         )
 
         # Second query with history
-        conversation_history = "User: First question\nAssistant: First response"
+        conversation_history = [
+            {"role": "user", "content": "First question"},
+            {"role": "assistant", "content": "First response"},
+        ]
         rag_system.session_manager.get_conversation_history.return_value = (
             conversation_history
         )
@@ -461,10 +488,211 @@ class TestRAGSystemIntegration:
             "Second response with context"
         )
 
-        response2, _ = rag_system.query("Follow up", session_id=session_id)
+        response2, _ = await rag_system.query("Follow up", session_id=session_id)
 
         # Verify history was used
-        second_call_args = rag_system.ai_generator.generate_response.call_args_list[1][
+        second_kwargs = rag_system.ai_generator.generate_response.call_args_list[
             1
+        ].kwargs
+        assert second_kwargs["conversation_history"] == conversation_history
+
+    async def test_repeated_query_served_from_cache(self, rag_system):
+        """Test identical queries reuse the cached answer and sources"""
+        # Setup
+        rag_system.ai_generator.generate_response.return_value = "Cached answer"
+        rag_system.tool_manager.tool_run.return_value = nullcontext(
+            ToolRun(
+                sources=[
+                    {
+                        "text": "Test Course - Lesson 1",
+                        "link": "https://example.com/lesson/1",
+                    }
+                ]
+            )
+        )
+
+        # Execute the same query twice
+        first = await rag_system.query("What is covered in lesson 1?")
+        second = await rag_system.query("What is covered in lesson 1?")
+
+        # Verify the second query skipped generation but kept the sources
+        assert first == second
+        assert second[1][0]["text"] == "Test Course - Lesson 1"
+        rag_system.ai_generator.generate_response.assert_called_once()
+
+    async def test_query_stream_yields_deltas_then_sources(self, rag_system):
+        """Test streamed queries forward text deltas, then sources, and are cached"""
+
+        # Setup
+        async def stream(**kwargs):
+            yield {"type": "delta", "text": "Lesson 1 "}
+            yield {"type": "delta", "text": "covers MCP"}
+
+        rag_system.ai_generator.generate_response_stream.side_effect = stream
+        sources = [{"text": "Test Course - Lesson 1", "link": None}]
+        rag_system.tool_manager.tool_run.return_value = nullcontext(
+            ToolRun(sources=sources)
+        )
+
+        # Execute
+        events = [event async for event in rag_system.query_stream("Lesson 1?")]
+
+        # Verify event order and that query() now hits the cache
+        assert events == [
+            {"type": "delta", "text": "Lesson 1 "},
+            {"type": "delta", "text": "covers MCP"},
+            {"type": "sources", "sources": sources},
+        ]
+        rag_system.tool_manager.tool_run.assert_called_once()
+        assert await rag_system.query("Lesson 1?") == ("Lesson 1 covers MCP", sources)
+        rag_system.ai_generator.generate_response.assert_not_called()
+
+    async def test_query_stream_answer_excludes_discarded_text(self, rag_system):
+        """Test text retracted before a tool call is kept out of the stored answer"""
+
+        # Setup
+        async def stream(**kwargs):
+            yield {"type": "delta", "text": "Let me search."}
+            yield {"type": "discard"}
+            yield {"type": "delta", "text": "Lesson 1 covers MCP"}
+
+        rag_system.ai_generator.generate_response_stream.side_effect = stream
+        rag_system.session_manager.get_conversation_history.return_value = None
+
+        # Execute
+        events = [
+            event
+            async for event in rag_system.query_stream("Lesson 1?", session_id="s1")
+        ]
+
+        # Verify the discard is forwarded and the answer matches query()'s
+        assert {"type": "discard"} in events
+        rag_system.session_manager.add_exchange.assert_called_once_with(
+            "s1", "Lesson 1?", "Lesson 1 covers MCP"
+        )
+        assert await rag_system.query("Lesson 1?") == ("Lesson 1 covers MCP", [])
+
+    async def test_empty_answer_is_not_cached(self, rag_system):
+        """Test an empty answer is regenerated rather than served from the cache"""
+        # Setup
+        rag_system.ai_generator.generate_response.side_effect = ["", "Answer"]
+
+        # Execute
+        first = await rag_system.query("Question")
+        second = await rag_system.query("Question")
+
+        # Verify
+        assert first == ("", [])
+        assert second == ("Answer", [])
+        assert rag_system.ai_generator.generate_response.call_count == 2
+
+    async def test_failed_tool_run_is_not_cached(self, rag_system, mock_vector_store):
+        """Test an answer written after a tool raised is regenerated on repeat"""
+        # Setup real tools so the failure is recorded on the production path
+        mock_vector_store.search.side_effect = [
+            RuntimeError("store unavailable"),
+            SearchResults(
+                documents=["MCP content"],
+                metadata=[{"course_title": "MCP Course"}],
+                distances=[0.1],
+            ),
+        ]
+        rag_system.tool_manager = ToolManager()
+        rag_system.tool_manager.register_tool(CourseSearchTool(mock_vector_store))
+
+        async def generate_response(query, conversation_history, tools, tool_manager):
+            try:
+                await asyncio.to_thread(
+                    tool_manager.execute_tool, "search_course_content", query="MCP"
+                )
+            except RuntimeError:
+                return "Answer without search results"
+            return "Answer from search results"
+
+        rag_system.ai_generator.generate_response.side_effect = generate_response
+
+        # Execute
+        first = await rag_system.query("Question")
+        second = await rag_system.query("Question")
+        third = await rag_system.query("Question")
+
+        # Verify the failed run was retried and only the good answer cached
+        assert first == ("Answer without search results", [])
+        assert second == (
+            "Answer from search results",
+            [{"text": "MCP Course", "link": None}],
+        )
+        assert third == second
+        assert rag_system.ai_generator.generate_response.call_count == 2
+
+    async def test_cache_keyed_on_conversation_history(self, rag_system):
+        """Test the same query with different history is not a cache hit"""
+        # Setup
+        session_id = "session_123"
+        rag_system.ai_generator.generate_response.return_value = "Answer"
+        rag_system.tool_manager.tool_run.return_value = nullcontext(ToolRun(sources=[]))
+        rag_system.session_manager.get_conversation_history.side_effect = [
+            None,
+            [
+                {"role": "user", "content": "First question"},
+                {"role": "assistant", "content": "Answer"},
+            ],
+        ]
+
+        # Execute
+        await rag_system.query("Same question", session_id=session_id)
+        await rag_system.query("Same question", session_id=session_id)
+
+        # Verify both queries reached the AI generator and were recorded
+        assert rag_system.ai_generator.generate_response.call_count == 2
+        assert rag_system.session_manager.add_exchange.call_count == 2
+
+    def test_adding_course_clears_response_cache(
+        self, rag_system, sample_course, sample_course_chunks
+    ):
+        """Test cached answers are dropped when the knowledge base changes"""
+        # Setup
+        rag_system.response_cache.set(b"key", ("Stale answer", []))
+        rag_system.document_processor.process_course_document.return_value = (
+            sample_course,
+            sample_course_chunks,
+        )
+
+        # Execute
+        rag_system.add_course_document("test_course.txt")
+
+        # Verify
+        assert len(rag_system.response_cache) == 0
+
+    async def test_query_batch_includes_retrieved_context(
+        self, rag_system, mock_vector_store, empty_search_results
+    ):
+        """Test batch queries are answered with pre-retrieved course content"""
+        # Setup real tools where only the first question finds content
+        mock_vector_store.search.side_effect = [
+            SearchResults(
+                documents=["Content A"],
+                metadata=[{"course_title": "Course A"}],
+                distances=[0.1],
+            ),
+            empty_search_results,
+        ]
+        rag_system.search_tool = CourseSearchTool(mock_vector_store)
+        rag_system.tool_manager = ToolManager()
+        rag_system.tool_manager.register_tool(rag_system.search_tool)
+        rag_system.ai_generator.generate_batch.return_value = ["Answer A", None]
+
+        # Execute
+        results = await rag_system.query_batch(["Question A", "Question B"])
+
+        # Verify prompts carry the retrieved context
+        prompts = rag_system.ai_generator.generate_batch.call_args[0][0]
+        assert "Question A" in prompts[0]
+        assert "Content A" in prompts[0]
+        assert "No relevant content found" in prompts[1]
+
+        # Verify responses are paired with the sources of their own search
+        assert results == [
+            ("Answer A", [{"text": "Course A", "link": None}]),
+            (None, []),
         ]
-        assert second_call_args["conversation_history"] == conversation_history
@@ -0,0 +1,63 @@
+from unittest.mock import patch
+from response_cache import ResponseCache
+
+
+class TestResponseCache:
+    """Test suite for the in-memory response cache"""
+
+    def test_get_returns_stored_value(self):
+        """Test a stored value is returned for the same key"""
+        cache = ResponseCache(max_size=2, ttl=60)
+        key = ResponseCache.make_key("query", None, [{"name": "tool"}])
+
+        cache.set(key, ("answer", []))
+
+        assert cache.get(key) == ("answer", [])
+
+    def test_get_missing_key_returns_none(self):
+        """Test a missing key is a cache miss"""
+        cache = ResponseCache()
+
+        assert cache.get(ResponseCache.make_key("unknown")) is None
+
+    def test_make_key_depends_on_every_part(self):
+        """Test keys differ when any input differs"""
+        base = ResponseCache.make_key("query", "history", [{"name": "tool"}])
+
+        assert base == ResponseCache.make_key("query", "history", [{"name": "tool"}])
+        assert base != ResponseCache.make_key("other", "history", [{"name": "tool"}])
+        assert base != ResponseCache.make_key("query", None, [{"name": "tool"}])
+        assert base != ResponseCache.make_key("query", "history", [])
+
+    def test_least_recently_used_entry_evicted(self):
+        """Test the least recently used entry is evicted when full"""
+        cache = ResponseCache(max_size=2, ttl=60)
+        cache.set(b"a", 1)
+        cache.set(b"b", 2)
+
+        # Touch "a" so "b" becomes least recently used
+        cache.get(b"a")
+        cache.set(b"c", 3)
+
+        assert cache.get(b"a") == 1
+        assert cache.get(b"b") is None
+        assert cache.get(b"c") == 3
+        assert len(cache) == 2
+
+    def test_expired_entry_is_a_miss(self):
+        """Test entries are dropped once their TTL has passed"""
+        cache = ResponseCache(max_size=2, ttl=10)
+
+        with patch("response_cache.time.monotonic", return_value=100.0):
+            cache.set(b"a", 1)
+        with patch("response_cache.time.monotonic", return_value=111.0):
+            assert cache.get(b"a") is None
+
+        assert len(cache) == 0
+
+    def test_zero_size_disables_caching(self):
+        """Test a max_size of 0 never keeps entries"""
+        cache = ResponseCache(max_size=0)
+        cache.set(b"a", 1)
+
+        assert cache.get(b"a") is None
@@ -1,23 +1,9 @@
 import pytest
-from unittest.mock import Mock, patch
-from ai_generator import AIGenerator
+from types import SimpleNamespace
+from unittest.mock import Mock, call
 
-
-class TestSequentialToolIntegration:
-    """Integration tests for sequential tool calling scenarios"""
-
-    # Removed ai_generator fixture - will create it in each test with proper mocking
-
-    @pytest.fixture
-    def mock_tool_manager(self):
-        """Create mock tool manager with realistic responses"""
-        manager = Mock()
-
-        # Mock responses for different tool calls
-        def execute_tool_side_effect(tool_name, **kwargs):
-            if tool_name == "get_course_outline":
-                if kwargs.get("course_name") == "Machine Learning Fundamentals":
-                    return """Course: Machine Learning Fundamentals
+# Fixed tool output and final answers used across the scenarios
+OUTLINE_TEXT = """Course: Machine Learning Fundamentals
 Instructor: Dr. Smith
 
 Lesson 0: Introduction to ML
@@ -27,15 +13,7 @@ Lesson 3: Unsupervised Learning
 Lesson 4: Neural Networks and Deep Learning
 Lesson 5: Model Evaluation
 """
-                return "Course not found"
-
-            elif tool_name == "search_course_content":
-                query = kwargs.get("query", "")
-                if (
-                    "neural networks" in query.lower()
-                    or "deep learning" in query.lower()
-                ):
-                    return """Found relevant courses:
+SEARCH_HIT = """Found relevant courses:
 - Advanced Deep Learning (Instructor: Prof. Johnson)
   - Covers neural network architectures, backpropagation, CNNs, RNNs
   - Lesson 2: Deep Neural Networks focuses on multi-layer perceptrons
@@ -45,54 +23,7 @@ Lesson 5: Model Evaluation
   - Lesson 6: Introduction to Neural Networks
   - Covers basic perceptron, activation functions, gradient descent
 """
-                return "No relevant content found"
-
-            return "Tool execution error"
-
-        manager.execute_tool.side_effect = execute_tool_side_effect
-        return manager
-
-    @patch("anthropic.Anthropic")
-    def test_complex_course_comparison_scenario(
-        self, mock_anthropic_class, mock_tool_manager
-    ):
-        """
-        Test complex scenario: 'Find a course that discusses the same topic as lesson 4 of Machine Learning Fundamentals'
-
-        Expected flow:
-        1. Get outline of 'Machine Learning Fundamentals' to find what lesson 4 covers
-        2. Search for courses that discuss neural networks/deep learning
-        3. Synthesize comparison results
-        """
-        # Setup mock client
-        mock_client = Mock()
-
-        # Round 1: Claude gets course outline
-        first_response = Mock()
-        first_response.stop_reason = "tool_use"
-        first_tool_block = Mock()
-        first_tool_block.type = "tool_use"
-        first_tool_block.name = "get_course_outline"
-        first_tool_block.input = {"course_name": "Machine Learning Fundamentals"}
-        first_tool_block.id = "tool_1"
-        first_response.content = [first_tool_block]
-
-        # Round 2: Claude searches for related courses
-        second_response = Mock()
-        second_response.stop_reason = "tool_use"
-        second_tool_block = Mock()
-        second_tool_block.type = "tool_use"
-        second_tool_block.name = "search_course_content"
-        second_tool_block.input = {"query": "neural networks deep learning"}
-        second_tool_block.id = "tool_2"
-        second_response.content = [second_tool_block]
-
-        # Final synthesis
-        final_response = Mock()
-        final_response.content = [Mock()]
-        final_response.content[
-            0
-        ].text = """Based on the course outline, lesson 4 of Machine Learning Fundamentals covers "Neural Networks and Deep Learning". 
+FINAL_COMPLEX_TEXT = """Based on the course outline, lesson 4 of Machine Learning Fundamentals covers "Neural Networks and Deep Learning". 
 
 I found two courses that discuss the same topic:
 
@@ -101,206 +32,232 @@ I found two courses that discuss the same topic:
 2. **Artificial Intelligence Concepts** (Dr. Lee) - Lesson 6 covers "Introduction to Neural Networks" which overlaps with the neural networks portion of lesson 4.
 
 Advanced Deep Learning would be the most similar course as it focuses specifically on the deep learning concepts covered in lesson 4."""
+MULTI_COURSE_TEXT = "Comprehensive comparison of machine learning courses based on search and outline results."
+DATA_SCIENCE_TEXT = "Based on the search, here are the available data science courses with their key topics."
+
+# Responses are only read by AIGenerator, so each distinct one is built once
+# and shared by every test that scripts it
+_RESPONSES = {}
+
+
+def make_tool_use_response(name, inp, tool_id):
+    """Anthropic response whose only content block is a single tool call"""
+    key = ("tool_use", name, frozenset(inp.items()), tool_id)
+    if key not in _RESPONSES:
+        tool_block = SimpleNamespace(type="tool_use", name=name, input=inp, id=tool_id)
+        _RESPONSES[key] = SimpleNamespace(stop_reason="tool_use", content=[tool_block])
+    return _RESPONSES[key]
+
+
+def make_text_response(text, stop_reason="end_turn"):
+    """Anthropic response with a single text block"""
+    key = ("text", text, stop_reason)
+    if key not in _RESPONSES:
+        text_block = SimpleNamespace(type="text", text=text)
+        _RESPONSES[key] = SimpleNamespace(stop_reason=stop_reason, content=[text_block])
+    return _RESPONSES[key]
+
+
+# Tool definitions offered in every scenario; AIGenerator leaves them unmodified,
+# and sharing one list lets it reuse its cache-tagged copy across tests
+TOOLS = [
+    {"name": "get_course_outline", "description": "Get course overview"},
+    {"name": "search_course_content", "description": "Search course content"},
+]
+
+# (query, scripted responses, expected tool calls, answer fragments)
+SCENARIOS = [
+    # Outline lesson 4 of one course, search for its topic, then compare
+    pytest.param(
+        "Find a course that discusses the same topic as lesson 4 of Machine Learning Fundamentals",
+        [
+            make_tool_use_response(
+                "get_course_outline",
+                {"course_name": "Machine Learning Fundamentals"},
+                "tool_1",
+            ),
+            make_tool_use_response(
+                "search_course_content",
+                {"query": "neural networks deep learning"},
+                "tool_2",
+            ),
+            make_text_response(FINAL_COMPLEX_TEXT),
+        ],
+        [
+            call("get_course_outline", course_name="Machine Learning Fundamentals"),
+            call("search_course_content", query="neural networks deep learning"),
+        ],
+        [
+            "Neural Networks and Deep Learning",
+            "Advanced Deep Learning",
+            "Prof. Johnson",
+            "most similar course",
+        ],
+        id="complex_course_comparison",
+    ),
+    # Search across courses, then outline one of them
+    pytest.param(
+        "Compare the machine learning courses and give me details about Advanced Deep Learning",
+        [
+            make_tool_use_response(
+                "search_course_content",
+                {"query": "machine learning algorithms"},
+                "tool_1",
+            ),
+            make_tool_use_response(
+                "get_course_outline",
+                {"course_name": "Advanced Deep Learning"},
+                "tool_2",
+            ),
+            make_text_response(MULTI_COURSE_TEXT),
+        ],
+        [
+            call("search_course_content", query="machine learning algorithms"),
+            call("get_course_outline", course_name="Advanced Deep Learning"),
+        ],
+        [MULTI_COURSE_TEXT],
+        id="multi_course_comparison",
+    ),
+    # Broad search, after which Claude already has enough to answer
+    pytest.param(
+        "What data science courses are available?",
+        [
+            make_tool_use_response(
+                "search_course_content", {"query": "data science"}, "tool_1"
+            ),
+            make_text_response(DATA_SCIENCE_TEXT, stop_reason="stop"),
+        ],
+        [call("search_course_content", query="data science")],
+        ["data science courses"],
+        id="progressive_refinement",
+    ),
+]
+
+
+# Canned tool output: course outlines by name, and the search hit returned
+# for queries mentioning any of the trigger phrases
+_OUTLINE_TABLE = {"Machine Learning Fundamentals": OUTLINE_TEXT}
+_SEARCH_TRIGGERS = ("neural networks", "deep learning")
+
+
+def _handle_search(query):
+    """Search hit if the query mentions a trigger phrase"""
+    lowered = query.lower()
+    if any(trigger in lowered for trigger in _SEARCH_TRIGGERS):
+        return SEARCH_HIT
+    return "No relevant content found"
+
+
+_TOOL_HANDLERS = {
+    "get_course_outline": lambda **kwargs: _OUTLINE_TABLE.get(
+        kwargs.get("course_name"), "Course not found"
+    ),
+    "search_course_content": lambda **kwargs: _handle_search(kwargs.get("query", "")),
+}
+
+
+def _execute_tool(tool_name, **kwargs):
+    """Dispatch a tool call to its canned handler"""
+    handler = _TOOL_HANDLERS.get(tool_name)
+    return handler(**kwargs) if handler else "Tool execution error"
+
+
+class FailingToolManager:
+    """Tool manager whose tools all fail by returning None, counting calls"""
+
+    def __init__(self):
+        self.execute_tool_calls = 0
+
+    def execute_tool(self, tool_name, **kwargs):
+        self.execute_tool_calls += 1
+        return None
+
+
+@pytest.fixture(scope="class")
+def scenario_tool_manager():
+    """Tool manager with realistic responses, built once per class"""
+    manager = Mock()
+    manager.execute_tool.side_effect = _execute_tool
+    return manager
+
+
+@pytest.fixture(scope="class")
+def failed_search_response():
+    """Tool round with text alongside a search call that will fail, built once per class"""
+    return SimpleNamespace(
+        stop_reason="tool_use",
+        content=[
+            SimpleNamespace(type="text", text="I'll search for course information."),
+            SimpleNamespace(
+                type="tool_use",
+                name="search_course_content",
+                input={"query": "test"},
+                id="tool_1",
+            ),
+        ],
+    )
 
-        # Configure mock client
-        mock_client.messages.create.side_effect = [
-            first_response,
-            second_response,
-            final_response,
-        ]
-        mock_anthropic_class.return_value = mock_client
-
-        # Create AIGenerator instance with mocked client
-        ai_generator = AIGenerator("test_api_key", "test-model")
-
-        tools = [
-            {"name": "get_course_outline", "description": "Get course overview"},
-            {"name": "search_course_content", "description": "Search course content"},
-        ]
-
-        # Execute the complex query
-        result = ai_generator.generate_response(
-            "Find a course that discusses the same topic as lesson 4 of Machine Learning Fundamentals",
-            tools=tools,
-            tool_manager=mock_tool_manager,
-        )
-
-        # Verify the complete workflow
-        assert mock_client.messages.create.call_count == 3
-        assert mock_tool_manager.execute_tool.call_count == 2
 
-        # Verify first tool call got course outline
-        mock_tool_manager.execute_tool.assert_any_call(
-            "get_course_outline", course_name="Machine Learning Fundamentals"
-        )
-
-        # Verify second tool call searched for neural networks content
-        mock_tool_manager.execute_tool.assert_any_call(
-            "search_course_content", query="neural networks deep learning"
-        )
+class TestSequentialToolIntegration:
+    """Integration tests for sequential tool calling scenarios"""
 
-        # Verify final result contains meaningful comparison
-        assert "Neural Networks and Deep Learning" in result
-        assert "Advanced Deep Learning" in result
-        assert "Prof. Johnson" in result
-        assert "most similar course" in result
+    @pytest.fixture
+    def mock_tool_manager(self, scenario_tool_manager):
+        """Class-wide tool manager with its call history cleared for this test"""
+        scenario_tool_manager.reset_mock()
+        return scenario_tool_manager
 
-    @patch("anthropic.Anthropic")
-    def test_multi_course_comparison_scenario(
-        self, mock_anthropic_class, mock_tool_manager
+    @pytest.fixture
+    def messages_create(self, ai_generator):
+        """The shared client's messages.create mock, which scripts Claude's replies"""
+        return ai_generator.client.messages.create
+
+    @pytest.mark.parametrize(
+        "query,responses,expected_tool_calls,expected_fragments",
+        SCENARIOS,
+    )
+    async def test_sequential_scenario(
+        self,
+        ai_generator,
+        messages_create,
+        mock_tool_manager,
+        query,
+        responses,
+        expected_tool_calls,
+        expected_fragments,
     ):
-        """
-        Test scenario requiring comparison across multiple courses
-        """
-        # Setup mock client
-        mock_client = Mock()
-
-        # Round 1: Search for machine learning courses
-        first_response = Mock()
-        first_response.stop_reason = "tool_use"
-        first_tool_block = Mock()
-        first_tool_block.type = "tool_use"
-        first_tool_block.name = "search_course_content"
-        first_tool_block.input = {"query": "machine learning algorithms"}
-        first_tool_block.id = "tool_1"
-        first_response.content = [first_tool_block]
-
-        # Round 2: Get outline of specific course
-        second_response = Mock()
-        second_response.stop_reason = "tool_use"
-        second_tool_block = Mock()
-        second_tool_block.type = "tool_use"
-        second_tool_block.name = "get_course_outline"
-        second_tool_block.input = {"course_name": "Advanced Deep Learning"}
-        second_tool_block.id = "tool_2"
-        second_response.content = [second_tool_block]
-
-        # Final response
-        final_response = Mock()
-        final_response.content = [Mock()]
-        final_response.content[0].text = (
-            "Comprehensive comparison of machine learning courses based on search and outline results."
-        )
-
-        mock_client.messages.create.side_effect = [
-            first_response,
-            second_response,
-            final_response,
-        ]
-        mock_anthropic_class.return_value = mock_client
-
-        # Create AIGenerator instance with mocked client
-        ai_generator = AIGenerator("test_api_key", "test-model")
-
-        tools = [
-            {"name": "get_course_outline", "description": "Get course overview"},
-            {"name": "search_course_content", "description": "Search course content"},
-        ]
+        """Test multi-round tool scenarios run each scripted round, then answer"""
+        messages_create.side_effect = responses
 
         # Execute
-        result = ai_generator.generate_response(
-            "Compare the machine learning courses and give me details about Advanced Deep Learning",
-            tools=tools,
-            tool_manager=mock_tool_manager,
+        result = await ai_generator.generate_response(
+            query, tools=TOOLS, tool_manager=mock_tool_manager
         )
 
-        # Verify sequential execution with different tool types
-        assert mock_client.messages.create.call_count == 3
-        assert mock_tool_manager.execute_tool.call_count == 2
-
-        # Verify mixed tool usage
-        calls = mock_tool_manager.execute_tool.call_args_list
-        assert calls[0][0] == ("search_course_content",)
-        assert calls[1][0] == ("get_course_outline",)
+        # Verify every scripted round ran and tools were called in order
+        assert messages_create.call_count == len(responses)
+        assert mock_tool_manager.execute_tool.call_args_list == expected_tool_calls
 
-        assert (
-            result
-            == "Comprehensive comparison of machine learning courses based on search and outline results."
-        )
+        # Verify the final answer is Claude's last response
+        for fragment in expected_fragments:
+            assert fragment in result
 
-    @patch("anthropic.Anthropic")
-    def test_progressive_refinement_scenario(
-        self, mock_anthropic_class, mock_tool_manager
+    async def test_error_recovery_in_multi_round_scenario(
+        self, ai_generator, messages_create, failed_search_response
     ):
-        """
-        Test progressive refinement: broad search → specific outline → detailed content
-        """
-        mock_client = Mock()
-
-        # Round 1: Broad search
-        first_response = Mock()
-        first_response.stop_reason = "tool_use"
-        first_tool_block = Mock()
-        first_tool_block.type = "tool_use"
-        first_tool_block.name = "search_course_content"
-        first_tool_block.input = {"query": "data science"}
-        first_tool_block.id = "tool_1"
-        first_response.content = [first_tool_block]
-
-        # Round 2: Early termination - Claude has enough info
-        second_response = Mock()
-        second_response.stop_reason = "stop"
-        second_response.content = [Mock()]
-        second_response.content[0].text = (
-            "Based on the search, here are the available data science courses with their key topics."
-        )
-
-        mock_client.messages.create.side_effect = [first_response, second_response]
-        mock_anthropic_class.return_value = mock_client
-
-        # Create AIGenerator instance with mocked client
-        ai_generator = AIGenerator("test_api_key", "test-model")
-
-        tools = [{"name": "search_course_content"}, {"name": "get_course_outline"}]
-
-        # Execute
-        result = ai_generator.generate_response(
-            "What data science courses are available?",
-            tools=tools,
-            tool_manager=mock_tool_manager,
-        )
-
-        # Verify early termination works correctly
-        assert (
-            mock_client.messages.create.call_count == 2
-        )  # Stopped after first round + response
-        assert mock_tool_manager.execute_tool.call_count == 1
-        assert "data science courses" in result
-
-    @patch("anthropic.Anthropic")
-    def test_error_recovery_in_multi_round_scenario(self, mock_anthropic_class):
         """Test error recovery when first tool call fails but system continues gracefully"""
         # Create failing tool manager
-        failing_tool_manager = Mock()
-        failing_tool_manager.execute_tool.return_value = None  # Simulate failure
-
-        mock_client = Mock()
+        failing_tool_manager = FailingToolManager()
 
         # Claude tries to use tools but they fail
-        tool_response = Mock()
-        tool_response.stop_reason = "tool_use"
-        tool_block = Mock()
-        tool_block.type = "tool_use"
-        tool_block.name = "search_course_content"
-        tool_block.input = {"query": "test"}
-        tool_block.id = "tool_1"
-        tool_response.content = [tool_block, Mock()]
-        tool_response.content[0].text = "I'll search for course information."
-
-        mock_client.messages.create.return_value = tool_response
-        mock_anthropic_class.return_value = mock_client
-
-        # Create AIGenerator instance with mocked client
-        ai_generator = AIGenerator("test_api_key", "test-model")
-
-        tools = [{"name": "search_course_content"}]
+        messages_create.return_value = failed_search_response
 
         # Execute with failing tools
-        result = ai_generator.generate_response(
-            "Find me course information", tools=tools, tool_manager=failing_tool_manager
+        result = await ai_generator.generate_response(
+            "Find me course information", tools=TOOLS, tool_manager=failing_tool_manager
         )
 
         # Verify graceful failure handling
-        assert mock_client.messages.create.call_count == 1
-        assert failing_tool_manager.execute_tool.call_count == 1
+        assert messages_create.call_count == 1
+        assert failing_tool_manager.execute_tool_calls == 1
         assert result == "I'll search for course information."
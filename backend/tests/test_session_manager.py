@@ -0,0 +1,67 @@
+import pytest
+from session_manager import SessionManager
+
+
+class TestSessionManager:
+    """Test suite for conversation history kept per session"""
+
+    @pytest.fixture
+    def session_manager(self):
+        """SessionManager keeping the last two exchanges"""
+        return SessionManager(max_history=2)
+
+    def test_history_as_api_messages(self, session_manager):
+        """Test history is returned as alternating Claude API messages"""
+        # Setup
+        session_id = session_manager.create_session()
+        session_manager.add_exchange(session_id, "What is MCP?", "A protocol.")
+
+        # Execute
+        history = session_manager.get_conversation_history(session_id)
+
+        # Verify
+        assert history == [
+            {"role": "user", "content": "What is MCP?"},
+            {"role": "assistant", "content": "A protocol."},
+        ]
+
+    def test_history_truncated_to_whole_exchanges(self, session_manager):
+        """Test truncation keeps max_history exchanges and starts on a user turn"""
+        # Setup
+        session_id = session_manager.create_session()
+        for n in range(1, 4):
+            session_manager.add_exchange(session_id, f"Question {n}", f"Answer {n}")
+
+        # Execute
+        history = session_manager.get_conversation_history(session_id)
+
+        # Verify only the last two exchanges remain
+        assert len(history) == session_manager.max_history * 2
+        assert history[0] == {"role": "user", "content": "Question 2"}
+        assert [msg["role"] for msg in history] == ["user", "assistant"] * 2
+
+    @pytest.mark.parametrize("session_id", [None, "unknown_session"])
+    def test_no_history_for_missing_session(self, session_manager, session_id):
+        """Test missing sessions produce no history rather than an empty list"""
+        assert session_manager.get_conversation_history(session_id) is None
+
+    def test_no_history_for_new_session(self, session_manager):
+        """Test a session without exchanges produces no history"""
+        session_id = session_manager.create_session()
+
+        assert session_manager.get_conversation_history(session_id) is None
+
+    def test_empty_answer_is_not_recorded(self, session_manager):
+        """Test an exchange without an answer leaves the history unchanged"""
+        # Setup
+        session_id = session_manager.create_session()
+        session_manager.add_exchange(session_id, "First question", "First answer")
+
+        # Execute
+        session_manager.add_exchange(session_id, "Second question", "")
+
+        # Verify no empty assistant message would be sent back to the API
+        assert session_manager.get_conversation_history(session_id) == [
+            {"role": "user", "content": "First question"},
+            {"role": "assistant", "content": "First answer"},
+        ]
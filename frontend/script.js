@@ -83,7 +83,7 @@ async function sendMessage() {
     chatMessages.scrollTop = chatMessages.scrollHeight;
 
     try {
-        const response = await fetch(`${API_URL}/query`, {
+        const response = await fetch(`${API_URL}/query/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -97,17 +97,67 @@ async function sendMessage() {
 
         if (!response.ok) throw new Error('Query failed');
 
-        const data = await response.json();
-
-        // Update session ID if new
-        if (!currentSessionId) {
-            currentSessionId = data.session_id;
+        // Read server-sent events, rendering the answer as text arrives
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let answer = '';
+        let answerContent = null;
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const rawEvent of events) {
+                if (!rawEvent.startsWith('data: ')) continue;
+                const event = JSON.parse(rawEvent.slice(6));
+
+                if (event.type === 'session') {
+                    // Update session ID if new
+                    if (!currentSessionId) {
+                        currentSessionId = event.session_id;
+                    }
+                } else if (event.type === 'delta') {
+                    answer += event.text;
+                    // Replace loading message with the streamed response
+                    if (!answerContent) {
+                        loadingMessage.remove();
+                        const messageId = addMessage('', 'assistant');
+                        answerContent = document.querySelector(`#message-${messageId} .message-content`);
+                    }
+                    answerContent.innerHTML = marked.parse(answer);
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                } else if (event.type === 'discard') {
+                    // Text so far came before a tool call - wait for the answer
+                    answer = '';
+                    if (answerContent) {
+                        answerContent.parentElement.remove();
+                        answerContent = null;
+                        chatMessages.appendChild(loadingMessage);
+                    }
+                } else if (event.type === 'sources') {
+                    // Re-render the finished answer with its sources
+                    if (answerContent) {
+                        answerContent.parentElement.remove();
+                    } else {
+                        loadingMessage.remove();
+                    }
+                    addMessage(answer, 'assistant', event.sources);
+                } else if (event.type === 'error') {
+                    // Drop the partial answer so only the error is shown
+                    if (answerContent) {
+                        answerContent.parentElement.remove();
+                        answerContent = null;
+                    }
+                    throw new Error(event.detail);
+                }
+            }
         }
 
-        // Replace loading message with response
-        loadingMessage.remove();
-        addMessage(data.answer, 'assistant', data.sources);
-
     } catch (error) {
         // Replace loading message with error (unless aborted)
         if (error.name !== 'AbortError') {